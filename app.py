@@ -1,100 +1,341 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_file
+from flask import Flask, Blueprint, Response, current_app, render_template, request, redirect, url_for, session, jsonify, send_file
 from flask_bcrypt import Bcrypt
-from datetime import datetime, timedelta
+from flask_mail import Mail, Message
+from datetime import datetime, timedelta, timezone
 import sqlite3
 import os
-import json
-import matplotlib
-matplotlib.use('Agg')  
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib.backends.backend_pdf import PdfPages
 import io
-import base64
-import schedule
-import threading
-import time
-from flask_mail import Mail, Message
-import schedule
-import threading
 import time
-
-
-
-app = Flask(__name__)
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = 'team.exptracker@gmail.com'
-app.config['MAIL_PASSWORD'] = 'nqru ttmb ulgc atlg'
-
-mail = Mail(app)
-
-app.secret_key = 'your-secret-key-change-in-production'
-bcrypt = Bcrypt(app)
-
-# Database initialization
-def init_db():
-    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'expense_tracker.db')
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    
-    # Users table
-    c.execute('''CREATE TABLE IF NOT EXISTS users
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+import click
+import assets
+import charts
+import budgets
+import events
+import forecast
+import jobs
+import limiter
+import replica
+import sync
+from archive import archive_old_expenses, archived_expenses
+from currency import rates, load_rates_file, sum_by_key, SUPPORTED_CURRENCIES, DEFAULT_RATES_FILE
+from money import Money, format_money, scale_of, scale_sql
+
+# Nothing in this module touches the database, starts threads or loads
+# matplotlib at import time. Use create_app() to build the app, the CLI
+# commands below to set up the database, and start_scheduler() for reminders.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'expense_tracker.db')
+
+DEFAULT_CONFIG = {
+    'DATABASE': DB_PATH,
+    'SECRET_KEY': 'your-secret-key-change-in-production',
+    'MAIL_SERVER': 'smtp.gmail.com',
+    'MAIL_PORT': 587,
+    'MAIL_USE_TLS': True,
+    'MAIL_USERNAME': 'team.exptracker@gmail.com',
+    'MAIL_PASSWORD': 'nqru ttmb ulgc atlg',
+    # Expenses older than this move to the compressed archive
+    'ARCHIVE_AFTER_DAYS': 730,
+    # Run queued background jobs on a thread in the web process as well
+    'JOBS_IN_PROCESS': True,
+    # Percentages of the monthly budget that trigger a live alert
+    'BUDGET_ALERT_THRESHOLDS': (50, 80, 100),
+    # Most operations accepted by one /api/v1/batch request
+    'BATCH_MAX_OPERATIONS': 500,
+    # Most entries in one /api/v1/changes page
+    'CHANGES_PAGE_SIZE': 500,
+    # Token-bucket admission control (limiter.py): tokens each endpoint
+    # costs, (capacity, refill per second) per user and for everyone, and
+    # how long a request may wait for tokens before getting a 429
+    'RATE_LIMIT_ENABLED': True,
+    'RATE_LIMIT_STORAGE': 'sqlite',
+    # Bucket file for 'sqlite' storage; defaults to DATABASE + '.limits'
+    'RATE_LIMIT_DATABASE': None,
+    'RATE_LIMIT_COSTS': {
+        'main.statistics': 1,
+        'main.all_records': 1,
+        'main.api_changes': 1,
+        'main.expense_chart': 5,
+        'main.balance_chart': 5,
+        'main.home_pie_chart': 5,
+        'main.export_statistics': 10,
+    },
+    'RATE_LIMIT_USER': (60, 2),
+    'RATE_LIMIT_GLOBAL': (400, 40),
+    'RATE_LIMIT_MAX_WAIT': 2.0,
+    # Read-only snapshot for analytics routes (replica.py); defaults to
+    # DATABASE + '.replica'. A snapshot older than REPLICA_MAX_STALENESS
+    # seconds is not used (0 turns the replica off).
+    'REPLICA_DATABASE': None,
+    'REPLICA_MAX_STALENESS': 300,
+    'REPLICA_REFRESH_INTERVAL': 60,
+    # Bytes of the snapshot to memory-map when reading (0 = off)
+    'REPLICA_MMAP_SIZE': 0,
+}
+
+bp = Blueprint('main', __name__)
+mail = Mail()
+bcrypt = Bcrypt()
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    # FLASK_DATABASE, FLASK_SECRET_KEY, ... override the defaults
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
+
+    mail.init_app(app)
+    bcrypt.init_app(app)
+    app.register_blueprint(bp)
+    app.add_template_filter(format_money, 'money')
+    assets.init_app(app)
+    replica.init_app(app)
+    limiter.init_app(app)
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(load_rates_command)
+    app.cli.add_command(run_scheduler_command)
+    app.cli.add_command(archive_expenses_command)
+    app.cli.add_command(rebuild_forecasts_command)
+    return app
+
+# Matplotlib is only needed by the chart and export routes, so it is loaded
+# on the first render instead of at startup
+def load_pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+# Table definitions. Money columns are INTEGER amounts in the minor unit of
+# the row's currency (see money.py). Also used to rebuild tables when a
+# column type changes.
+TABLES = {
+    'users': '''(id INTEGER PRIMARY KEY AUTOINCREMENT,
                   username TEXT UNIQUE NOT NULL,
                   email TEXT UNIQUE NOT NULL,
                   phone TEXT NOT NULL,
                   password TEXT NOT NULL,
                   currency TEXT NOT NULL,
-                  balance REAL NOT NULL DEFAULT 0,
+                  balance INTEGER NOT NULL DEFAULT 0,
                   theme TEXT DEFAULT 'light',
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    
-    # Expenses table
-    c.execute('''CREATE TABLE IF NOT EXISTS expenses
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+
+    'expenses': '''(id INTEGER PRIMARY KEY AUTOINCREMENT,
                   user_id INTEGER NOT NULL,
-                  amount REAL NOT NULL,
+                  amount INTEGER NOT NULL,
                   category TEXT NOT NULL,
                   description TEXT,
                   date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  FOREIGN KEY (user_id) REFERENCES users (id))''')
-    
-    # Planned payments table
-    c.execute('''CREATE TABLE IF NOT EXISTS planned_payments
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  currency TEXT,
+                  anomaly INTEGER NOT NULL DEFAULT 0,
+                  FOREIGN KEY (user_id) REFERENCES users (id))''',
+
+    'planned_payments': '''(id INTEGER PRIMARY KEY AUTOINCREMENT,
                   user_id INTEGER NOT NULL,
                   title TEXT NOT NULL,
-                  amount REAL NOT NULL,
+                  amount INTEGER NOT NULL,
                   payment_date DATE NOT NULL,
                   category TEXT,
                   recurring INTEGER DEFAULT 0,
-                  FOREIGN KEY (user_id) REFERENCES users (id))''')
-    
-    # Budget table
-    c.execute('''CREATE TABLE IF NOT EXISTS budget
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  reminder_sent INTEGER DEFAULT 0,
+                  FOREIGN KEY (user_id) REFERENCES users (id))''',
+
+    'budget': '''(id INTEGER PRIMARY KEY AUTOINCREMENT,
                   user_id INTEGER NOT NULL,
                   month INTEGER NOT NULL,
                   year INTEGER NOT NULL,
-                  amount REAL NOT NULL,
+                  amount INTEGER NOT NULL,
                   FOREIGN KEY (user_id) REFERENCES users (id),
-                  UNIQUE(user_id, month, year))''')
+                  UNIQUE(user_id, month, year))''',
+
+    # Month-to-date spend in the user's currency, kept up to date by the
+    # expense write path (budgets.py)
+    'budget_progress': '''(user_id INTEGER NOT NULL,
+                  year INTEGER NOT NULL,
+                  month INTEGER NOT NULL,
+                  spent INTEGER NOT NULL,
+                  PRIMARY KEY (user_id, year, month))''',
+
+    # Streaming spend statistics per user and category (forecast.py)
+    'forecast_state': '''(user_id INTEGER NOT NULL,
+                  category TEXT NOT NULL,
+                  n INTEGER NOT NULL,
+                  mean REAL NOT NULL,
+                  var REAL NOT NULL,
+                  month INTEGER NOT NULL,
+                  month_total REAL NOT NULL,
+                  months INTEGER NOT NULL,
+                  monthly_mean REAL NOT NULL,
+                  weights TEXT NOT NULL,
+                  PRIMARY KEY (user_id, category))''',
+
+    # Exchange rates, as units of currency per 1 USD on a given date
+    'exchange_rates': '''(rate_date DATE NOT NULL,
+                  currency TEXT NOT NULL,
+                  per_usd REAL NOT NULL,
+                  PRIMARY KEY (currency, rate_date))''',
+
+    # Old expenses, one zlib-compressed JSON payload per user and year (archive.py)
+    'expense_archive': '''(user_id INTEGER NOT NULL,
+                  year INTEGER NOT NULL,
+                  row_count INTEGER NOT NULL,
+                  payload BLOB NOT NULL,
+                  PRIMARY KEY (user_id, year))''',
+
+    # Per-user change sequence and the latest change to each synced row,
+    # written by triggers (sync.py)
+    'change_seq': '''(user_id INTEGER PRIMARY KEY,
+                  seq INTEGER NOT NULL)''',
+
+    'changes': '''(user_id INTEGER NOT NULL,
+                  entity TEXT NOT NULL,
+                  entity_id INTEGER NOT NULL,
+                  seq INTEGER NOT NULL,
+                  deleted INTEGER NOT NULL DEFAULT 0,
+                  archived INTEGER NOT NULL DEFAULT 0,
+                  PRIMARY KEY (user_id, entity, entity_id))''',
+
+    # Background jobs and their progress (jobs.py)
+    'jobs': '''(id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  user_id INTEGER,
+                  kind TEXT NOT NULL,
+                  params TEXT,
+                  status TEXT NOT NULL DEFAULT 'queued',
+                  done INTEGER NOT NULL DEFAULT 0,
+                  total INTEGER,
+                  error TEXT,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+}
+
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (user_id, date)',
+    'CREATE INDEX IF NOT EXISTS idx_planned_payments_user ON planned_payments (user_id, payment_date)',
+    "CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs (status, id)",
+    'CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_changes_user_seq ON changes (user_id, seq)',
+]
+
+# Money columns and the SQL expression for the currency that sets their scale
+MONEY_COLUMNS = {
+    'users': ('balance', 'users.currency'),
+    'expenses': ('amount', 'COALESCE(expenses.currency, (SELECT currency FROM users WHERE users.id = expenses.user_id))'),
+    'planned_payments': ('amount', '(SELECT currency FROM users WHERE users.id = planned_payments.user_id)'),
+    'budget': ('amount', '(SELECT currency FROM users WHERE users.id = budget.user_id)'),
+}
+
+# Add a column to an existing table if an older database does not have it yet
+def add_column_if_missing(c, table, column, definition):
+    columns = [row[1] for row in c.execute(f'PRAGMA table_info({table})')]
+    if column not in columns:
+        c.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        return True
+    return False
+
+# Older databases stored money as REAL. Each table is rebuilt with INTEGER
+# minor units in its own short transaction, so the app can keep serving
+# between tables. Every row must land within half a minor unit of its old
+# value and no rows may go missing, otherwise that table is left untouched.
+def migrate_money_to_minor_units(conn):
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        for table, (column, currency_expr) in MONEY_COLUMNS.items():
+            info = conn.execute(f'PRAGMA table_info({table})').fetchall()
+            if next(row[2] for row in info if row[1] == column).upper() != 'REAL':
+                continue
+
+            columns = [row[1] for row in info]
+            scale = scale_sql(currency_expr)
+            select = ', '.join(
+                f'CAST(ROUND({table}.{c} * {scale}) AS INTEGER)' if c == column else f'{table}.{c}'
+                for c in columns
+            )
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                seq = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+                conn.execute(f'DROP TABLE IF EXISTS {table}_migrating')
+                conn.execute(f'CREATE TABLE {table}_migrating {TABLES[table]}')
+                conn.execute(f'INSERT INTO {table}_migrating ({", ".join(columns)}) SELECT {select} FROM {table}')
+
+                old_count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                new_count = conn.execute(f'SELECT COUNT(*) FROM {table}_migrating').fetchone()[0]
+                drifted = conn.execute(
+                    f'''SELECT COUNT(*) FROM {table} JOIN {table}_migrating m ON m.id = {table}.id
+                        WHERE ABS({table}.{column} * {scale} - m.{column}) > 0.5'''
+                ).fetchone()[0]
+                if old_count != new_count or drifted:
+                    raise RuntimeError(f'{table}.{column}: {old_count - new_count} rows lost, {drifted} rows drifted')
+
+                conn.execute(f'DROP TABLE {table}')
+                conn.execute(f'ALTER TABLE {table}_migrating RENAME TO {table}')
+                # Keep AUTOINCREMENT from reusing ids of deleted rows
+                if seq:
+                    conn.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (seq[0], table))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+    finally:
+        conn.isolation_level = isolation_level
+
+# Database initialization
+def init_db(db_path=None):
+    conn = sqlite3.connect(db_path or current_app.config['DATABASE'])
+    c = conn.cursor()
+
+    for table, columns in TABLES.items():
+        c.execute(f'CREATE TABLE IF NOT EXISTS {table} {columns}')
+
+    # Older databases: every expense was recorded in the user's own currency
+    if add_column_if_missing(c, 'expenses', 'currency', 'TEXT'):
+        c.execute('''UPDATE expenses SET currency =
+                     (SELECT currency FROM users WHERE users.id = expenses.user_id)
+                     WHERE currency IS NULL''')
+    add_column_if_missing(c, 'planned_payments', 'reminder_sent', 'INTEGER DEFAULT 0')
+    add_column_if_missing(c, 'expenses', 'anomaly', 'INTEGER NOT NULL DEFAULT 0')
     
     conn.commit()
-    conn.close()
 
-init_db()
+    migrate_money_to_minor_units(conn)
+
+    # After migrations, which rebuild tables and drop their indexes and triggers
+    for index in INDEXES:
+        c.execute(index)
+    for trigger in sync.triggers():
+        c.execute(trigger)
+    conn.commit()
+    sync.backfill(conn)
+
+    # Seed the bundled offline rates on a fresh database
+    if c.execute('SELECT COUNT(*) FROM exchange_rates').fetchone()[0] == 0:
+        load_rates_file(conn, DEFAULT_RATES_FILE)
+
+    conn.close()
 
 # Helper functions
 def get_db_connection():
-    # Use absolute path to ensure database is in the correct location
-    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'expense_tracker.db')
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(current_app.config['DATABASE'])
     conn.row_factory = sqlite3.Row
     return conn
 
+def get_analytics_connection():
+    # Long read-only scans go to the analytics snapshot when it is fresh
+    # enough and newer than the user's last change, otherwise to the primary.
+    # Background jobs keep changing data after the request that queued them
+    # has returned, so their progress counts as a change too.
+    not_before = session.get('wrote_at')
+    if 'user_id' in session:
+        conn = get_db_connection()
+        job_mark = jobs.changed_at(conn, session['user_id'])
+        conn.close()
+        if job_mark and (not_before is None or job_mark > not_before):
+            not_before = job_mark
+    return replica.connect(not_before=not_before) or get_db_connection()
+
 def get_user_expenses(user_id, days=30):
     conn = get_db_connection()
     start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
@@ -117,14 +358,103 @@ def update_user_balance(user_id, amount):
     conn.commit()
     conn.close()
 
+def get_user_currency(conn, user_id):
+    user = conn.execute('SELECT currency FROM users WHERE id = ?', (user_id,)).fetchone()
+    return user['currency'] if user else 'USD'
+
+def expense_in_user_currency(conn, amount, currency, user_currency, date):
+    # Amount (minor units) of one expense as Money in the currency the
+    # balance is kept in
+    return rates.convert(conn, Money(amount, currency or user_currency), user_currency, date)
+
+def to_major(minor_amounts, currency):
+    # Minor units -> plain numbers for charts
+    return [m / 10 ** scale_of(currency) for m in minor_amounts]
+
+def category_totals(conn, user_id, since, currency):
+    # Per-category spend since a SQLite datetime modifier (e.g. '-30 days'),
+    # converted to the given currency. Rows are pre-aggregated per currency
+    # and day so the conversion runs once over a small result set.
+    rows = conn.execute(
+        '''SELECT category, COALESCE(currency, ?) AS currency,
+                  substr(date, 1, 10) AS day, SUM(amount) AS total
+           FROM expenses
+           WHERE user_id = ? AND date >= datetime('now', ?)
+           GROUP BY category, 2, day''',
+        (currency, user_id, since)
+    ).fetchall()
+
+    # Archived expenses inside the window, if the window reaches that far
+    since_date = conn.execute("SELECT datetime('now', ?)", (since,)).fetchone()[0]
+    rows += [
+        {'category': e['category'], 'currency': e['currency'] or currency,
+         'day': e['date'][:10], 'total': e['amount']}
+        for e in archived_expenses(conn, user_id, since=since_date)
+    ]
+    return sum_by_key(conn, rows, currency)
+
+def enqueue_job(conn, user_id, kind, params=None):
+    job_id = jobs.enqueue(conn, user_id, kind, params)
+    if current_app.config['JOBS_IN_PROCESS']:
+        jobs.start_worker(current_app._get_current_object(), get_db_connection)
+    return job_id
+
+@jobs.handler('delete_expenses')
+def delete_expenses_job(conn, user_id, params, report):
+    # Only rows that existed when the user asked; newer ones are kept
+    where, args = 'user_id = ? AND id <= ?', (user_id, params['max_id'])
+    total = conn.execute(f'SELECT COUNT(*) FROM expenses WHERE {where}', args).fetchone()[0]
+    report(0, total)
+    done = jobs.delete_in_batches(conn, 'expenses', where, args, report, total=total)
+    jobs.delete_in_batches(conn, 'expense_archive', 'user_id = ?', (user_id,), lambda *a: None)
+    sync.tombstone_archived(conn, user_id)
+    # Counters recount from what is left. Expenses added since the request
+    # are kept, so their forecast state is rebuilt rather than wiped.
+    budgets.reset(conn, user_id)
+    conn.commit()
+    jobs.enqueue(conn, user_id, 'rebuild_forecast')
+    report(done, total)
+
+@jobs.handler('delete_profile')
+def delete_profile_job(conn, user_id, params, report):
+    # The change log goes last: the deletes before it add tombstones to it
+    tables = ['expenses', 'planned_payments', 'budget', 'budget_progress', 'forecast_state', 'expense_archive',
+              'changes', 'change_seq']
+    total = sum(
+        conn.execute(f'SELECT COUNT(*) FROM {table} WHERE user_id = ?', (user_id,)).fetchone()[0]
+        for table in tables
+    )
+    report(0, total)
+    done = 0
+    for table in tables:
+        done = jobs.delete_in_batches(conn, table, 'user_id = ?', (user_id,), report, done, total)
+
+@jobs.handler('archive_expenses')
+def archive_expenses_job(conn, user_id, params, report):
+    archive_old_expenses(conn, params['days'], progress=report)
+
+@jobs.handler('rebuild_forecast')
+def rebuild_forecast_job(conn, user_id, params, report):
+    # One user after a currency change, or everyone (nightly)
+    report(0, 1)
+    forecast.rebuild(conn, None if user_id is None else [user_id])
+    report(1, 1)
+
+@bp.after_app_request
+def remember_write(response):
+    # Time of the user's last change, so analytics reads skip older snapshots
+    if request.method == 'POST' and 'user_id' in session and response.status_code < 400:
+        session['wrote_at'] = time.time()
+    return response
+
 # Routes
-@app.route('/')
+@bp.route('/')
 def index():
     if 'user_id' in session:
-        return redirect(url_for('home'))
-    return redirect(url_for('login'))
+        return redirect(url_for('main.home'))
+    return redirect(url_for('main.login'))
 
-@app.route('/signup', methods=['GET', 'POST'])
+@bp.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
         data = request.get_json()
@@ -133,7 +463,10 @@ def signup():
         phone = data.get('phone')
         password = data.get('password')
         currency = data.get('currency')
-        balance = float(data.get('balance', 0))
+        try:
+            balance = Money.parse(data.get('balance', 0), currency)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)})
         
         conn = get_db_connection()
         
@@ -153,7 +486,7 @@ def signup():
         # Insert user
         conn.execute(
             'INSERT INTO users (username, email, phone, password, currency, balance) VALUES (?, ?, ?, ?, ?, ?)',
-            (username, email, phone, hashed_password, currency, balance)
+            (username, email, phone, hashed_password, currency, balance.minor)
         )
         conn.commit()
         conn.close()
@@ -162,7 +495,7 @@ def signup():
     
     return render_template('signup.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         data = request.get_json()
@@ -186,15 +519,15 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/home')
+@bp.route('/home')
 def home():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     user_id = session['user_id']
     conn = get_db_connection()
@@ -203,7 +536,7 @@ def home():
     
     if not user:
         session.clear()
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     # Get last month expenses
     expenses = get_user_expenses(user_id, 30)
@@ -212,9 +545,26 @@ def home():
     
     # Get last 2-3 expenses
     recent_expenses = expenses[:3] if expenses else []
-    
-    # Get upcoming payments
+
     conn = get_db_connection()
+
+    # Last 30 days total in the user's currency
+    total_expense = 0
+    if expenses:
+        total_expense = round(float(rates.convert_many(
+            conn,
+            [e['amount'] for e in expenses],
+            [e['currency'] or user['currency'] for e in expenses],
+            [e['date'] for e in expenses],
+            user['currency']
+        ).sum()))
+    
+    # Where this month is heading
+    now = datetime.now()
+    month_spent = budgets.get_spent(conn, user_id, now.year, now.month, user['currency'])
+    projected = forecast.projected_total(conn, user_id, now.year, now.month, month_spent)
+
+    # Get upcoming payments
     upcoming_payments = conn.execute(
         '''SELECT * FROM planned_payments 
            WHERE user_id = ? AND payment_date >= date('now')
@@ -224,52 +574,82 @@ def home():
     conn.close()
     
     return render_template('home.html', user=user, expenses=expenses, 
-                         recent_expenses=recent_expenses, upcoming_payments=upcoming_payments)
+                         recent_expenses=recent_expenses, upcoming_payments=upcoming_payments,
+                         total_expense=total_expense, month_spent=month_spent, projected=projected,
+                         currencies=SUPPORTED_CURRENCIES)
 
-@app.route('/add_expense', methods=['POST'])
+@bp.route('/add_expense', methods=['POST'])
 def add_expense():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'})
     
     data = request.get_json()
     user_id = session['user_id']
-    amount = float(data.get('amount', 0))
     category = data.get('category')
     description = data.get('description', '')
     is_income = data.get('is_income', False)
 
     conn = get_db_connection()
+    user_currency = get_user_currency(conn, user_id)
+    currency = (data.get('currency') or user_currency).upper()
+    # Same UTC timestamp the date column defaults to. The balance is charged
+    # at this date's rate too, so edits and deletes refund exactly the same.
+    spent_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
 
+    try:
+        amount = Money.parse(data.get('amount', 0), currency)
+        balance_amount = rates.convert(conn, amount, user_currency, spent_at)
+    except ValueError as e:
+        conn.close()
+        return jsonify({'success': False, 'message': str(e)})
+
+    change = None
+    usual = None
     if is_income:
         conn.execute(
             'UPDATE users SET balance = balance + ? WHERE id = ?',
-            (amount, user_id)
+            (balance_amount.minor, user_id)
         )
     else:
+        # Compared against the category's history before it is updated
+        usual = forecast.observe(conn, user_id, category, balance_amount.minor, spent_at)
         conn.execute(
-            'INSERT INTO expenses (user_id, amount, category, description) VALUES (?, ?, ?, ?)',
-            (user_id, amount, category, description)
+            '''INSERT INTO expenses (user_id, amount, category, description, currency, date, anomaly)
+               VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            (user_id, amount.minor, category, description, currency, spent_at, int(usual is not None))
         )
         conn.execute(
             'UPDATE users SET balance = balance - ? WHERE id = ?',
-            (amount, user_id)
+            (balance_amount.minor, user_id)
         )
+        change = budgets.record_spend(conn, user_id, spent_at, balance_amount.minor, user_currency)
 
     conn.commit()
     conn.close()
-
-    return jsonify({'success': True, 'message': 'Transaction added successfully'})
-@app.route('/get_expense/<int:expense_id>')
+    if change:
+        budgets.publish(user_id, change, current_app.config['BUDGET_ALERT_THRESHOLDS'])
+
+    result = {'success': True, 'message': 'Transaction added successfully'}
+    if usual is not None:
+        result['anomaly'] = {
+            'category': category,
+            'usual': format_money(round(usual), user_currency),
+            'currency': user_currency,
+        }
+    return jsonify(result)
+@bp.route('/get_expense/<int:expense_id>')
 def get_expense(expense_id):
     conn = get_db_connection()
     expense = conn.execute(
-        "SELECT amount, category, description FROM expenses WHERE id = ?",
+        "SELECT amount, category, description, currency FROM expenses WHERE id = ?",
         (expense_id,)
     ).fetchone()
     conn.close()
 
-    return jsonify(dict(expense))
-@app.route('/edit_expense/<int:expense_id>', methods=['GET', 'POST'])
+    expense = dict(expense)
+    expense['amount'] = float(Money(expense['amount'], expense['currency']))
+    return jsonify(expense)
+@bp.route('/edit_expense/<int:expense_id>', methods=['GET', 'POST'])
 
 #Added this edit method 
 def edit_expense(expense_id):
@@ -291,38 +671,57 @@ def edit_expense(expense_id):
         "Investments", "Other"
     ]
 
+    user_currency = get_user_currency(conn, session['user_id'])
+
     if request.method == 'POST':
-        new_amount = float(request.form['amount'])
         new_category = request.form['category']
         new_description = request.form['description']
+        new_currency = request.form.get('currency', expense['currency'] or user_currency).upper()
 
-        old_amount = expense['amount']
-        diff = new_amount - old_amount
+        # Balance is kept in the user's currency, so compare both amounts there
+        try:
+            new_amount = Money.parse(request.form['amount'], new_currency)
+            old_amount = expense_in_user_currency(
+                conn, expense['amount'], expense['currency'], user_currency, expense['date'])
+            new_balance_amount = rates.convert(conn, new_amount, user_currency, expense['date'])
+        except ValueError:
+            conn.close()
+            return redirect('/all_records')
+        diff = new_balance_amount - old_amount
 
         conn.execute(
             """UPDATE expenses
-               SET amount = ?, category = ?, description = ?
+               SET amount = ?, category = ?, description = ?, currency = ?
                WHERE id = ?""",
-            (new_amount, new_category, new_description, expense_id)
+            (new_amount.minor, new_category, new_description, new_currency, expense_id)
         )
 
         conn.execute(
             "UPDATE users SET balance = balance - ? WHERE id = ?",
-            (diff, session['user_id'])
+            (diff.minor, session['user_id'])
         )
+        if new_category == expense['category']:
+            forecast.adjust(conn, session['user_id'], new_category, expense['date'], diff.minor)
+        else:
+            forecast.adjust(conn, session['user_id'], expense['category'], expense['date'], -old_amount.minor)
+            forecast.adjust(conn, session['user_id'], new_category, expense['date'], new_balance_amount.minor)
+        change = budgets.record_spend(conn, session['user_id'], expense['date'], diff.minor, user_currency)
 
         conn.commit()
         conn.close()
+        budgets.publish(session['user_id'], change, current_app.config['BUDGET_ALERT_THRESHOLDS'])
         return redirect('/all_records')
 
     conn.close()
     return render_template(
         'edit_expense.html',
         expense=expense,
-        categories=categories
+        categories=categories,
+        currencies=SUPPORTED_CURRENCIES,
+        user_currency=user_currency
     )
 
-@app.route('/delete_expense/<int:expense_id>', methods=['POST'])
+@bp.route('/delete_expense/<int:expense_id>', methods=['POST'])
 def delete_expense(expense_id):
     if 'user_id' not in session:
         return redirect('/login')
@@ -331,12 +730,14 @@ def delete_expense(expense_id):
 
     # Get amount before deleting
     expense = conn.execute(
-        "SELECT amount FROM expenses WHERE id = ? AND user_id = ?",
+        "SELECT amount, currency, date, category FROM expenses WHERE id = ? AND user_id = ?",
         (expense_id, session['user_id'])
     ).fetchone()
 
     if expense:
-        amount = expense['amount']
+        user_currency = get_user_currency(conn, session['user_id'])
+        amount = expense_in_user_currency(
+            conn, expense['amount'], expense['currency'], user_currency, expense['date'])
 
         # Delete expense
         conn.execute(
@@ -347,30 +748,52 @@ def delete_expense(expense_id):
         # Update balance
         conn.execute(
             "UPDATE users SET balance = balance + ? WHERE id = ?",
-            (amount, session['user_id'])
+            (amount.minor, session['user_id'])
         )
+        forecast.adjust(conn, session['user_id'], expense['category'], expense['date'], -amount.minor)
+        change = budgets.record_spend(conn, session['user_id'], expense['date'], -amount.minor, user_currency)
 
         conn.commit()
+        budgets.publish(session['user_id'], change, current_app.config['BUDGET_ALERT_THRESHOLDS'])
 
     conn.close()
     return redirect('/all_records')
 
-@app.route('/profile', methods=['GET', 'POST'])
+@bp.route('/profile', methods=['GET', 'POST'])
 def profile():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     user_id = session['user_id']
     conn = get_db_connection()
     
     if request.method == 'POST':
         data = request.get_json()
+        old_currency = get_user_currency(conn, user_id)
         conn.execute(
             'UPDATE users SET username = ?, email = ?, phone = ?, currency = ? WHERE id = ?',
             (data.get('username'), data.get('email'), data.get('phone'), 
              data.get('currency'), user_id)
         )
+        # Balance, budgets and planned payments keep their face value in the
+        # new currency, so their minor units change if its scale differs
+        shift = scale_of(data.get('currency')) - scale_of(old_currency)
+        if shift:
+            for table, column, key in [('users', 'balance', 'id'),
+                                       ('budget', 'amount', 'user_id'),
+                                       ('planned_payments', 'amount', 'user_id')]:
+                conn.execute(
+                    f'UPDATE {table} SET {column} = CAST(ROUND({column} * ?) AS INTEGER) WHERE {key} = ?',
+                    (10.0 ** shift, user_id)
+                )
+        # Spend counters and forecasts are kept in the old currency
+        currency_changed = data.get('currency') != old_currency
+        if currency_changed:
+            budgets.reset(conn, user_id)
+            forecast.reset(conn, user_id)
         conn.commit()
+        if currency_changed:
+            enqueue_job(conn, user_id, 'rebuild_forecast')
         session['username'] = data.get('username')
     
     user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
@@ -378,17 +801,17 @@ def profile():
     
     return render_template('profile.html', user=user)
 
-@app.route('/all_records')
+@bp.route('/all_records')
 def all_records():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     user_id = session['user_id']
     category_filter = request.args.get('category', '')
     date_from = request.args.get('date_from', '')
     date_to = request.args.get('date_to', '')
     
-    conn = get_db_connection()
+    conn = get_analytics_connection()
     query = 'SELECT * FROM expenses WHERE user_id = ?'
     params = [user_id]
     
@@ -406,129 +829,124 @@ def all_records():
     
     query += ' ORDER BY date DESC'
     expenses = conn.execute(query, params).fetchall()
+
+    # Older history lives in the archive; merge it in for the same filters
+    archived = [
+        e for e in archived_expenses(conn, user_id, since=date_from or None,
+                                     until=date_to + ' 23:59:59' if date_to else None)
+        if not category_filter or e['category'] == category_filter
+    ]
+    if archived:
+        expenses = sorted(expenses + archived, key=lambda e: e['date'], reverse=True)
+
+    # Total of the filtered records in the user's currency
+    currency = get_user_currency(conn, user_id)
+    total_expense = 0
+    if expenses:
+        total_expense = round(float(rates.convert_many(
+            conn,
+            [e['amount'] for e in expenses],
+            [e['currency'] or currency for e in expenses],
+            [e['date'] for e in expenses],
+            currency
+        ).sum()))
     conn.close()
     
-    return render_template('all_records.html', expenses=expenses)
+    return render_template('all_records.html', expenses=expenses,
+                           total_expense=total_expense, currency=currency)
 
-@app.route('/statistics')
+@bp.route('/statistics')
 def statistics():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     user_id = session['user_id']
-    conn = get_db_connection()
+    conn = get_analytics_connection()
 
     # 🔹 Get most spent category in last 30 days
-    top_category = conn.execute(
-        '''
-        SELECT category, SUM(amount) as total
-        FROM expenses
-        WHERE user_id = ?
-        AND date >= datetime('now','-30 days')
-        GROUP BY category
-        ORDER BY total DESC
-        LIMIT 1
-        ''',
-        (user_id,)
-    ).fetchone()
+    currency = get_user_currency(conn, user_id)
+    totals = category_totals(conn, user_id, '-30 days', currency)
+    top_category = max(totals, key=lambda t: t['total']) if totals else None
 
     conn.close()
 
     return render_template(
         'statistics.html',
-        top_category=top_category
+        top_category=top_category,
+        currency=currency
     )
 
-@app.route('/api/expense_chart')
+@bp.route('/api/expense_chart')
 def expense_chart():
     if 'user_id' not in session:
         return jsonify({'error': 'Not logged in'})
     
     user_id = session['user_id']
+    plt = load_pyplot()
     period = request.args.get('period', 'monthly')
     
-    conn = get_db_connection()
+    conn = get_analytics_connection()
+    currency = get_user_currency(conn, user_id)
     
     if period == 'monthly':
-        expenses = conn.execute(
-            '''SELECT category, SUM(amount) as total 
-               FROM expenses 
-               WHERE user_id = ? AND date >= datetime('now', '-30 days')
-               GROUP BY category''',
-            (user_id,)
-        ).fetchall()
+        expenses = category_totals(conn, user_id, '-30 days', currency)
     elif period == 'yearly':
-        expenses = conn.execute(
-            '''SELECT category, SUM(amount) as total 
-               FROM expenses 
-               WHERE user_id = ? AND date >= datetime('now', '-365 days')
-               GROUP BY category''',
-            (user_id,)
-        ).fetchall()
+        expenses = category_totals(conn, user_id, '-365 days', currency)
     else:  # daily
-        expenses = conn.execute(
-            '''SELECT category, SUM(amount) as total 
-               FROM expenses 
-               WHERE user_id = ? AND date >= datetime('now', '-7 days')
-               GROUP BY category''',
-            (user_id,)
-        ).fetchall()
+        expenses = category_totals(conn, user_id, '-7 days', currency)
     
     conn.close()
     
-    if not expenses:
-        # Return empty chart
-        plt.figure(figsize=(8, 8))
-        plt.text(0.5, 0.5, 'No expenses yet', ha='center', va='center', fontsize=14)
-        plt.axis('off')
-        img = io.BytesIO()
-        plt.savefig(img, format='png')
-        img.seek(0)
-        plt.close()
-        return send_file(img, mimetype='image/png')
-    
-    categories = [e['category'] for e in expenses]
-    amounts = [e['total'] for e in expenses]   # or e['amount'] if needed
-
-    plt.figure(figsize=(10,6))
+    # A few bars: small and sharp as SVG
+    spec = charts.chart_spec((10, 6), preferred=('svg', 'webp', 'png'))
+    with charts.style(plt, spec):
+        plt.figure(figsize=spec['figsize'])
 
-    if len(categories) == 0:
-        # show empty message chart
-        plt.text(0.5, 0.5, "No expense data", ha='center', va='center')
-    else:
-        plt.bar(categories, amounts, color='#4f46e5')
-
-    plt.title(f'Expenses by Category ({period.capitalize()})')
-    plt.xlabel("Category")
-    plt.ylabel("Amount (₹)")
-    plt.xticks(rotation=30)
-    plt.tight_layout()
-
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    plt.close()
+        if not expenses:
+            # Return empty chart
+            plt.text(0.5, 0.5, 'No expenses yet', ha='center', va='center', fontsize=14)
+            plt.axis('off')
+            return charts.send_chart(plt, spec)
         
-    return send_file(img, mimetype='image/png')
+        categories = [e['category'] for e in expenses]
+        amounts = to_major([e['total'] for e in expenses], currency)
 
-@app.route('/api/balance_chart')
+        plt.bar(categories, amounts, color='#4f46e5')
+        plt.title(f'Expenses by Category ({period.capitalize()})')
+        plt.xlabel("Category")
+        plt.ylabel(f"Amount ({currency})")
+        plt.xticks(rotation=30)
+        plt.tight_layout()
+        return charts.send_chart(plt, spec)
+
+@bp.route('/api/balance_chart')
 def balance_chart():
     if 'user_id' not in session:
         return jsonify({'error': 'Not logged in'})
     
     user_id = session['user_id']
+    plt = load_pyplot()
     conn = get_db_connection()
     
     # Get balance history (last 30 days)
     expenses = conn.execute(
-        '''SELECT date, amount FROM expenses 
+        '''SELECT date, amount, currency FROM expenses 
            WHERE user_id = ? AND date >= datetime('now', '-30 days')
            ORDER BY date ASC''',
         (user_id,)
     ).fetchall()
     
-    user = conn.execute('SELECT balance FROM users WHERE id = ?', (user_id,)).fetchone()
-    current_balance = user['balance']
+    user = conn.execute('SELECT balance, currency FROM users WHERE id = ?', (user_id,)).fetchone()
+    current_balance = float(Money(user['balance'], user['currency']))
+
+    # Amounts as they were deducted from the balance
+    deducted = to_major(rates.convert_many(
+        conn,
+        [e['amount'] for e in expenses],
+        [e['currency'] or user['currency'] for e in expenses],
+        [e['date'] for e in expenses],
+        user['currency']
+    ), user['currency']) if expenses else []
     conn.close()
     
     # Calculate running balance
@@ -536,8 +954,8 @@ def balance_chart():
     balances = []
     running_balance = current_balance
     
-    for expense in reversed(expenses):
-        running_balance += expense['amount']  # Add back since it was deducted
+    for expense, amount in zip(reversed(expenses), reversed(deducted)):
+        running_balance += amount  # Add back since it was deducted
         try:
             # Try parsing the date - handle different formats
             date_str = expense['date']
@@ -563,90 +981,81 @@ def balance_chart():
         balances.append(current_balance)
     
     # Create area chart
-    plt.figure(figsize=(10, 6))
-    if dates and len(dates) > 1:
-        plt.fill_between(dates, balances, alpha=0.3)
-        plt.plot(dates, balances, linewidth=2)
-    elif dates and len(dates) == 1:
-        # Only one point, show as horizontal line
-        plt.axhline(y=current_balance, color='blue', linewidth=2, label='Balance')
-        plt.text(0.5, 0.5, f'Current Balance: {current_balance:.2f}', 
-                transform=plt.gca().transAxes, ha='center', va='center', fontsize=12)
-    else:
-        # No expenses, show current balance
-        plt.text(0.5, 0.5, f'No transactions yet\nCurrent Balance: {current_balance:.2f}', 
-                transform=plt.gca().transAxes, ha='center', va='center', fontsize=12)
-    plt.title('Balance Trend (Last 30 Days)')
-    plt.xlabel('Date')
-    plt.ylabel('Balance')
-    if dates and len(dates) > 1:
-        plt.xticks(rotation=45)
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    plt.close()
-    
-    return send_file(img, mimetype='image/png')
-
-@app.route('/api/home_pie_chart')
+    spec = charts.chart_spec((10, 6), preferred=('svg', 'webp', 'png'))
+    with charts.style(plt, spec):
+        plt.figure(figsize=spec['figsize'])
+        if dates and len(dates) > 1:
+            plt.fill_between(dates, balances, alpha=0.3)
+            plt.plot(dates, balances, linewidth=2)
+        elif dates and len(dates) == 1:
+            # Only one point, show as horizontal line
+            plt.axhline(y=current_balance, color='blue', linewidth=2, label='Balance')
+            plt.text(0.5, 0.5, f'Current Balance: {current_balance:.2f}', 
+                    transform=plt.gca().transAxes, ha='center', va='center', fontsize=12)
+        else:
+            # No expenses, show current balance
+            plt.text(0.5, 0.5, f'No transactions yet\nCurrent Balance: {current_balance:.2f}', 
+                    transform=plt.gca().transAxes, ha='center', va='center', fontsize=12)
+        plt.title('Balance Trend (Last 30 Days)')
+        plt.xlabel('Date')
+        plt.ylabel(f"Balance ({user['currency']})")
+        if dates and len(dates) > 1:
+            plt.xticks(rotation=45)
+        plt.grid(True, alpha=0.3)
+        plt.tight_layout()
+        return charts.send_chart(plt, spec)
+
+@bp.route('/api/home_pie_chart')
 def home_pie_chart():
     if 'user_id' not in session:
         return jsonify({'error': 'Not logged in'})
     
     user_id = session['user_id']
+    plt = load_pyplot()
     conn = get_db_connection()
     
-    expenses = conn.execute(
-        '''SELECT category, SUM(amount) as total 
-           FROM expenses 
-           WHERE user_id = ? AND date >= datetime('now', '-30 days')
-           GROUP BY category''',
-        (user_id,)
-    ).fetchall()
+    currency = get_user_currency(conn, user_id)
+    expenses = category_totals(conn, user_id, '-30 days', currency)
     conn.close()
     
-    if not expenses:
-        # Return empty chart
-        plt.figure(figsize=(6, 6))
-        plt.text(0.5, 0.5, 'No expenses yet', ha='center', va='center')
-        plt.axis('off')
-        img = io.BytesIO()
-        plt.savefig(img, format='png')
-        img.seek(0)
-        plt.close()
-        return send_file(img, mimetype='image/png')
-    
-    categories = [e['category'] for e in expenses]
-    amounts = [e['total'] for e in expenses]
-    
-    plt.figure(figsize=(6, 6))
-    plt.pie(amounts, labels=categories, autopct='%1.1f%%', startangle=90)
-    plt.title('Last Month Expenses')
-    
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    plt.close()
-    
-    return send_file(img, mimetype='image/png')
+    spec = charts.chart_spec((6, 6), preferred=('svg', 'webp', 'png'))
+    with charts.style(plt, spec):
+        plt.figure(figsize=spec['figsize'])
 
-@app.route('/planned_payments', methods=['GET', 'POST'])
+        if not expenses:
+            # Return empty chart
+            plt.text(0.5, 0.5, 'No expenses yet', ha='center', va='center')
+            plt.axis('off')
+            return charts.send_chart(plt, spec)
+        
+        categories = [e['category'] for e in expenses]
+        amounts = [e['total'] for e in expenses]
+        
+        plt.pie(amounts, labels=categories, autopct='%1.1f%%', startangle=90)
+        plt.title('Last Month Expenses')
+        return charts.send_chart(plt, spec)
+
+@bp.route('/planned_payments', methods=['GET', 'POST'])
 def planned_payments():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     user_id = session['user_id']
     conn = get_db_connection()
     
+    currency = get_user_currency(conn, user_id)
+    
     if request.method == 'POST':
         data = request.get_json()
+        try:
+            amount = Money.parse(data.get('amount'), currency)
+        except ValueError as e:
+            conn.close()
+            return jsonify({'success': False, 'message': str(e)})
         conn.execute(
             '''INSERT INTO planned_payments (user_id, title, amount, payment_date, category, recurring)
                VALUES (?, ?, ?, ?, ?, ?)''',
-            (user_id, data.get('title'), float(data.get('amount')), 
+            (user_id, data.get('title'), amount.minor, 
              data.get('payment_date'), data.get('category'), 
              int(data.get('recurring', 0)))
         )
@@ -662,9 +1071,9 @@ def planned_payments():
     ).fetchall()
     conn.close()
     
-    return render_template('planned_payments.html', payments=payments, now=datetime.now())
+    return render_template('planned_payments.html', payments=payments, now=datetime.now(), currency=currency)
 
-@app.route('/edit_planned_payment/<int:payment_id>', methods=['POST'])
+@bp.route('/edit_planned_payment/<int:payment_id>', methods=['POST'])
 def edit_planned_payment(payment_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
@@ -673,18 +1082,23 @@ def edit_planned_payment(payment_id):
     conn = get_db_connection()
     
     data = request.get_json()
+    try:
+        amount = Money.parse(data['amount'], get_user_currency(conn, user_id))
+    except ValueError as e:
+        conn.close()
+        return jsonify({'success': False, 'message': str(e)})
     conn.execute('''
         UPDATE planned_payments 
         SET title = ?, amount = ?, payment_date = ?, category = ?, recurring = ?
         WHERE id = ? AND user_id = ?
-    ''', (data['title'], data['amount'], data['payment_date'], 
+    ''', (data['title'], amount.minor, data['payment_date'], 
           data['category'], data['recurring'], payment_id, user_id))
     
     conn.commit()
     conn.close()
     return jsonify({'success': True, 'message': 'Payment updated successfully'})
 
-@app.route('/delete_planned_payment/<int:payment_id>', methods=['POST'])
+@bp.route('/delete_planned_payment/<int:payment_id>', methods=['POST'])
 def delete_planned_payment(payment_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
@@ -699,6 +1113,250 @@ def delete_planned_payment(payment_id):
     
     return jsonify({'success': True, 'message': 'Payment deleted successfully'})
 
+# Batch API: several expense and planned-payment changes in one request and
+# one transaction. Every operation is checked before anything is written; if
+# any is invalid nothing is applied and each one's result says why.
+
+# Largest amount accepted, in minor units: far above any real expense and far
+# enough below SQLite's 64-bit INTEGER that conversions and sums stay in range
+MAX_BATCH_AMOUNT = 10 ** 15
+
+def op_id(op):
+    value = op.get('id')
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError('id must be an integer')
+    return value
+
+def op_text(op, key, default=None):
+    # String field of an operation, `default` when it is missing; null is
+    # allowed, any other type is not
+    value = op.get(key, default)
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f'{key} must be a string')
+    return value
+
+def check_amount(amount):
+    if amount.minor <= 0:
+        raise ValueError('amount must be positive')
+    if amount.minor > MAX_BATCH_AMOUNT:
+        raise ValueError('amount is too large')
+    return amount
+
+def plan_operation(conn, user_id, user_currency, op, now):
+    # Validate one operation and work out its effect without writing.
+    # `spend` is the change in spending in the user's currency.
+    if not isinstance(op, dict):
+        raise ValueError('Operation must be an object')
+    kind = op.get('op')
+
+    if kind == 'create_expense':
+        is_income = op.get('is_income', False)
+        if not isinstance(is_income, bool):
+            raise ValueError('is_income must be true or false')
+        currency = (op_text(op, 'currency') or user_currency).upper()
+        if currency not in SUPPORTED_CURRENCIES:
+            raise ValueError(f'Unsupported currency: {currency}')
+        amount = check_amount(Money.parse(op.get('amount'), currency))
+        if is_income:
+            # Like /add_expense: only the balance is credited, nothing is stored
+            return {'op': kind, 'income': True, 'amount': amount, 'date': now,
+                    'spend': -rates.convert(conn, amount, user_currency, now)}
+        category = op_text(op, 'category')
+        if not category:
+            raise ValueError('category is required')
+        return {'op': kind, 'amount': amount, 'category': category,
+                'description': op_text(op, 'description', ''), 'date': now,
+                'spend': rates.convert(conn, amount, user_currency, now)}
+
+    if kind in ('edit_expense', 'delete_expense'):
+        expense = conn.execute(
+            'SELECT * FROM expenses WHERE id = ? AND user_id = ?', (op_id(op), user_id)
+        ).fetchone()
+        if not expense:
+            raise ValueError('Expense not found')
+        old = expense_in_user_currency(conn, expense['amount'], expense['currency'], user_currency, expense['date'])
+        if kind == 'delete_expense':
+            return {'op': kind, 'expense': expense, 'date': expense['date'], 'old': old, 'spend': -old}
+
+        currency = (op_text(op, 'currency') or expense['currency'] or user_currency).upper()
+        if currency not in SUPPORTED_CURRENCIES:
+            raise ValueError(f'Unsupported currency: {currency}')
+        if 'amount' in op:
+            amount = Money.parse(op['amount'], currency)
+        else:
+            amount = Money(expense['amount'], expense['currency'] or user_currency)
+            if amount.currency != currency:
+                raise ValueError('amount is required when changing currency')
+        check_amount(amount)
+        new = rates.convert(conn, amount, user_currency, expense['date'])
+        return {'op': kind, 'expense': expense, 'amount': amount, 'date': expense['date'],
+                'category': op_text(op, 'category') or expense['category'],
+                'description': op_text(op, 'description', expense['description']),
+                'old': old, 'new': new, 'spend': new - old}
+
+    if kind == 'edit_planned_payment':
+        payment = conn.execute(
+            'SELECT * FROM planned_payments WHERE id = ? AND user_id = ?', (op_id(op), user_id)
+        ).fetchone()
+        if not payment:
+            raise ValueError('Planned payment not found')
+        payment_date = op.get('payment_date', payment['payment_date'])
+        try:
+            datetime.strptime(payment_date, '%Y-%m-%d')
+        except (TypeError, ValueError):
+            raise ValueError('payment_date must be YYYY-MM-DD')
+        amount = Money.parse(op['amount'], user_currency) if 'amount' in op else Money(payment['amount'], user_currency)
+        check_amount(amount)
+        return {'op': kind, 'payment': payment, 'amount': amount, 'payment_date': payment_date,
+                'title': op_text(op, 'title') or payment['title'],
+                'category': op_text(op, 'category', payment['category']),
+                'recurring': int(bool(op.get('recurring', payment['recurring']))),
+                'spend': Money.zero(user_currency)}
+
+    raise ValueError(f'Unknown operation: {kind!r}')
+
+def apply_operation(conn, user_id, user_currency, plan):
+    # Write one validated operation; returns its result entry
+    kind = plan['op']
+    if plan.get('income'):
+        return {}
+    if kind == 'create_expense':
+        usual = forecast.observe(conn, user_id, plan['category'], plan['spend'].minor, plan['date'])
+        cur = conn.execute(
+            '''INSERT INTO expenses (user_id, amount, category, description, currency, date, anomaly)
+               VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            (user_id, plan['amount'].minor, plan['category'], plan['description'],
+             plan['amount'].currency, plan['date'], int(usual is not None))
+        )
+        result = {'id': cur.lastrowid}
+        if usual is not None:
+            result['anomaly'] = {'category': plan['category'], 'currency': user_currency,
+                                 'usual': format_money(round(usual), user_currency)}
+        return result
+
+    if kind == 'edit_expense':
+        expense = plan['expense']
+        conn.execute(
+            'UPDATE expenses SET amount = ?, category = ?, description = ?, currency = ? WHERE id = ?',
+            (plan['amount'].minor, plan['category'], plan['description'], plan['amount'].currency, expense['id'])
+        )
+        if plan['category'] == expense['category']:
+            forecast.adjust(conn, user_id, expense['category'], expense['date'], plan['spend'].minor)
+        else:
+            forecast.adjust(conn, user_id, expense['category'], expense['date'], -plan['old'].minor)
+            forecast.adjust(conn, user_id, plan['category'], expense['date'], plan['new'].minor)
+        return {'id': expense['id']}
+
+    if kind == 'delete_expense':
+        expense = plan['expense']
+        conn.execute('DELETE FROM expenses WHERE id = ?', (expense['id'],))
+        forecast.adjust(conn, user_id, expense['category'], expense['date'], -plan['old'].minor)
+        return {'id': expense['id']}
+
+    payment = plan['payment']
+    conn.execute(
+        '''UPDATE planned_payments
+           SET title = ?, amount = ?, payment_date = ?, category = ?, recurring = ?
+           WHERE id = ?''',
+        (plan['title'], plan['amount'].minor, plan['payment_date'], plan['category'],
+         plan['recurring'], payment['id'])
+    )
+    return {'id': payment['id']}
+
+@bp.route('/api/v1/batch', methods=['POST'])
+def api_batch():
+    # Body: {"operations": [{"op": "create_expense", ...}, ...]} or a bare list
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+
+    user_id = session['user_id']
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else data
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'success': False, 'message': 'Expected a non-empty list of operations'}), 400
+    if len(operations) > current_app.config['BATCH_MAX_OPERATIONS']:
+        return jsonify({'success': False, 'message':
+                        f"At most {current_app.config['BATCH_MAX_OPERATIONS']} operations per batch"}), 400
+
+    conn = get_db_connection()
+    try:
+        # Hold the write lock from validation to commit so nothing changes in
+        # between; any error rolls back, so the lock is never left held
+        conn.execute('BEGIN IMMEDIATE')
+        user_currency = get_user_currency(conn, user_id)
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+        plans, results, seen = [], [], set()
+        for index, op in enumerate(operations):
+            try:
+                plan = plan_operation(conn, user_id, user_currency, op, now)
+                target = plan.get('expense') or plan.get('payment')
+                if target is not None:
+                    key = (plan['op'] == 'edit_planned_payment', target['id'])
+                    if key in seen:
+                        raise ValueError('Each item may only appear once per batch')
+                    seen.add(key)
+                plans.append(plan)
+                results.append({'index': index, 'op': plan['op'], 'success': True})
+            except (ValueError, KeyError, TypeError) as e:
+                results.append({'index': index, 'op': op.get('op') if isinstance(op, dict) else None,
+                                'success': False, 'message': str(e)})
+
+        if not all(r['success'] for r in results):
+            conn.rollback()
+            return jsonify({'success': False, 'message': 'No changes applied', 'results': results}), 400
+
+        # Apply everything, then settle the balance and budget counters once
+        spend = Money.zero(user_currency)
+        months = {}
+        for plan, result in zip(plans, results):
+            result.update(apply_operation(conn, user_id, user_currency, plan))
+            spend += plan['spend']
+            # Income moves the balance but is not spending, so budgets skip it
+            if plan['spend'] and not plan.get('income'):
+                date, delta = months.get(plan['date'][:7], (plan['date'], 0))
+                months[plan['date'][:7]] = (date, delta + plan['spend'].minor)
+        conn.execute('UPDATE users SET balance = balance - ? WHERE id = ?', (spend.minor, user_id))
+        changes = [budgets.record_spend(conn, user_id, date, delta, user_currency)
+                   for date, delta in months.values()]
+        conn.commit()
+        balance = conn.execute('SELECT balance FROM users WHERE id = ?', (user_id,)).fetchone()[0]
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    for change in changes:
+        budgets.publish(user_id, change, current_app.config['BUDGET_ALERT_THRESHOLDS'])
+    return jsonify({'success': True, 'results': results,
+                    'balance': format_money(balance, user_currency), 'currency': user_currency})
+
+@bp.route('/api/v1/changes')
+def api_changes():
+    # Everything that changed after ?since=<seq>, as NDJSON: one line per
+    # changed row (tombstones carry "deleted":1), then a cursor line with the
+    # `since` for the next request and whether another page is waiting.
+    # Amounts are integer minor units, as stored.
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+
+    page_size = current_app.config['CHANGES_PAGE_SIZE']
+    since = max(request.args.get('since', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', page_size, type=int), 1), page_size)
+
+    conn = get_db_connection()
+    # One snapshot for the change entries and the rows they point at
+    conn.execute('BEGIN')
+    records, next_since, more = sync.changes_since(conn, session['user_id'], since, limit)
+    conn.rollback()
+    conn.close()
+
+    records.append({'next': next_since, 'more': more})
+    response = Response(sync.ndjson(records), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 def check_payment_reminders():
     conn = get_db_connection()
 
@@ -706,7 +1364,7 @@ def check_payment_reminders():
 
     payments =conn.execute(
         '''
-        SELECT planned_payments.*, users.email
+        SELECT planned_payments.*, users.email, users.currency
         FROM planned_payments
         JOIN users ON planned_payments.user_id = users.id
         WHERE payment_date = ? AND reminder_sent = 0
@@ -718,7 +1376,7 @@ def check_payment_reminders():
         send_payment_email(
             p['email'],
             p['title'],
-            p['amount'],
+            f"{Money(p['amount'], p['currency'])} {p['currency']}",
             p['payment_date']
         )
 
@@ -735,7 +1393,7 @@ def send_payment_email(email, title, amount, date):
     try:
         msg = Message(
             subject=f"Reminder: {title} due tomorrow",
-            sender=app.config['MAIL_USERNAME'],
+            sender=current_app.config['MAIL_USERNAME'],
             recipients=[email]
         )
 
@@ -753,16 +1411,16 @@ def send_payment_email(email, title, amount, date):
         print("Email error:", e)
 
 #temparory testing
-@app.route("/test_email")
+@bp.route("/test_email")
 def test_email():
     send_payment_email("hetmewada01@gmail.com", "Test", 100, "Tomorrow")
     return "Email sent"
 
 
-@app.route('/budget', methods=['GET', 'POST'])
+@bp.route('/budget', methods=['GET', 'POST'])
 def budget():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     user_id = session['user_id']
     conn = get_db_connection()
@@ -771,16 +1429,31 @@ def budget():
         data = request.get_json()
         month = int(data.get('month'))
         year = int(data.get('year'))
-        amount = float(data.get('amount'))
+        try:
+            amount = Money.parse(data.get('amount'), get_user_currency(conn, user_id))
+        except ValueError as e:
+            conn.close()
+            return jsonify({'success': False, 'message': str(e)})
         
+        # Update in place rather than REPLACE, which would give the budget a
+        # new id without leaving a sync tombstone for the old one
         conn.execute(
-            '''INSERT OR REPLACE INTO budget (user_id, month, year, amount)
-               VALUES (?, ?, ?, ?)''',
-            (user_id, month, year, amount)
+            '''INSERT INTO budget (user_id, month, year, amount)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT (user_id, month, year) DO UPDATE SET amount = excluded.amount''',
+            (user_id, month, year, amount.minor)
         )
         conn.commit()
+        spent = budgets.get_spent(conn, user_id, year, month, amount.currency)
+        # The page updates in place from the returned state; other open
+        # pages get the same state over /events
+        change = {'year': year, 'month': month, 'currency': amount.currency,
+                  'before': spent, 'spent': spent, 'budget': amount.minor,
+                  'projected': forecast.projected_total(conn, user_id, year, month, spent)}
         conn.close()
-        return jsonify({'success': True, 'message': 'Budget set successfully'})
+        budgets.publish(user_id, change, current_app.config['BUDGET_ALERT_THRESHOLDS'])
+        return jsonify({'success': True, 'message': 'Budget set successfully',
+                        'budget': budgets.state(change)})
     
     # Get current month budget
     now = datetime.now()
@@ -789,22 +1462,19 @@ def budget():
         (user_id, now.month, now.year)
     ).fetchone()
     
-    # Get current month expenses
-    expenses = conn.execute(
-        '''SELECT SUM(amount) as total FROM expenses 
-           WHERE user_id = ? AND strftime("%m", date) = ? AND strftime("%Y", date) = ?''',
-        (user_id, f'{now.month:02d}', str(now.year))
-    ).fetchone()
-    
-    spent = expenses['total'] if expenses['total'] else 0
+    # Current month spend from the maintained counter
+    currency = get_user_currency(conn, user_id)
+    spent = budgets.get_spent(conn, user_id, now.year, now.month, currency)
+    projected = forecast.projected_total(conn, user_id, now.year, now.month, spent)
     conn.close()
     
-    return render_template('budget.html', budget=budget, spent=spent, current_month=now.month, current_year=now.year)
+    return render_template('budget.html', budget=budget, spent=spent, projected=projected,
+                           currency=currency, current_month=now.month, current_year=now.year)
 
-@app.route('/settings', methods=['GET', 'POST'])
+@bp.route('/settings', methods=['GET', 'POST'])
 def settings():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     user_id = session['user_id']
     conn = get_db_connection()
@@ -822,19 +1492,23 @@ def settings():
             session['theme'] = new_theme
             return jsonify({'success': True, 'theme': new_theme})
         
+        # Large deletes run as background jobs in small batches so they do
+        # not hold the database write lock; the page polls /jobs/<id>
         elif action == 'delete_expenses':
-            conn.execute('DELETE FROM expenses WHERE user_id = ?', (user_id,))
+            max_id = conn.execute('SELECT MAX(id) FROM expenses WHERE user_id = ?', (user_id,)).fetchone()[0]
             conn.execute('UPDATE users SET balance = 0 WHERE id = ?', (user_id,))
+            budgets.reset(conn, user_id)
+            forecast.reset(conn, user_id)
             conn.commit()
+            job_id = enqueue_job(conn, user_id, 'delete_expenses', {'max_id': max_id or 0})
             conn.close()
-            return jsonify({'success': True, 'message': 'All expense data deleted'})
+            return jsonify({'success': True, 'message': 'Deleting expense data', 'job_id': job_id})
         
         elif action == 'delete_profile':
-            conn.execute('DELETE FROM expenses WHERE user_id = ?', (user_id,))
-            conn.execute('DELETE FROM planned_payments WHERE user_id = ?', (user_id,))
-            conn.execute('DELETE FROM budget WHERE user_id = ?', (user_id,))
+            # The account disappears at once; its data is removed behind it
             conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
             conn.commit()
+            enqueue_job(conn, user_id, 'delete_profile')
             conn.close()
             session.clear()
             return jsonify({'success': True, 'message': 'Profile deleted'})
@@ -844,60 +1518,78 @@ def settings():
     
     return render_template('settings.html', user=user)
 
-@app.route('/export_statistics')
+@bp.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+
+    conn = get_db_connection()
+    job = conn.execute(
+        'SELECT id, kind, status, done, total, error FROM jobs WHERE id = ? AND user_id = ?',
+        (job_id, session['user_id'])
+    ).fetchone()
+    conn.close()
+
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, **dict(job)})
+
+@bp.route('/events')
+def event_stream():
+    # Server-Sent Events for the logged-in user's open pages (budget updates
+    # and threshold alerts). Browsers reconnect on their own and send
+    # Last-Event-ID, from which missed events are replayed.
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    response = Response(
+        events.stream(session['user_id'], int(last_event_id) if last_event_id.isdigit() else None),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/export_statistics')
 def export_statistics():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     user_id = session['user_id']
+    plt = load_pyplot()
     format_type = request.args.get('format', 'pdf')
     period = request.args.get('period', 'monthly')
     
-    conn = get_db_connection()
+    conn = get_analytics_connection()
+    currency = get_user_currency(conn, user_id)
     
     if period == 'monthly':
-        expenses = conn.execute(
-            '''SELECT category, SUM(amount) as total 
-               FROM expenses 
-               WHERE user_id = ? AND date >= datetime('now', '-30 days')
-               GROUP BY category''',
-            (user_id,)
-        ).fetchall()
+        expenses = category_totals(conn, user_id, '-30 days', currency)
         title = 'Monthly Expenses'
     elif period == 'yearly':
-        expenses = conn.execute(
-            '''SELECT category, SUM(amount) as total 
-               FROM expenses 
-               WHERE user_id = ? AND date >= datetime('now', '-365 days')
-               GROUP BY category''',
-            (user_id,)
-        ).fetchall()
+        expenses = category_totals(conn, user_id, '-365 days', currency)
         title = 'Yearly Expenses'
     else:
-        expenses = conn.execute(
-            '''SELECT category, SUM(amount) as total 
-               FROM expenses 
-               WHERE user_id = ? AND date >= datetime('now', '-7 days')
-               GROUP BY category''',
-            (user_id,)
-        ).fetchall()
+        expenses = category_totals(conn, user_id, '-7 days', currency)
         title = 'Weekly Expenses'
     
     conn.close()
     
     categories = [e['category'] for e in expenses]
-    amounts = [e['total'] for e in expenses]
+    amounts = to_major([e['total'] for e in expenses], currency)
     
     if format_type == 'pdf':
         # Create PDF with bar chart
+        from matplotlib.backends.backend_pdf import PdfPages
         img = io.BytesIO()
-        with PdfPages(img) as pdf:
+        with charts.render_lock, PdfPages(img) as pdf:
             fig, ax = plt.subplots(figsize=(10, 6))
             if categories:
                 ax.bar(categories, amounts)
                 ax.set_title(title)
                 ax.set_xlabel('Category')
-                ax.set_ylabel('Amount')
+                ax.set_ylabel(f'Amount ({currency})')
                 plt.xticks(rotation=45)
                 plt.tight_layout()
             pdf.savefig(fig)
@@ -906,21 +1598,20 @@ def export_statistics():
         return send_file(img, mimetype='application/pdf', as_attachment=True, 
                         download_name=f'expenses_{period}.pdf')
     else:
-        # Create JPG
-        plt.figure(figsize=(10, 6))
-        if categories:
-            plt.bar(categories, amounts)
-            plt.title(title)
-            plt.xlabel('Category')
-            plt.ylabel('Amount')
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-        img = io.BytesIO()
-        plt.savefig(img, format='jpg', dpi=150)
-        img.seek(0)
-        plt.close()
-        return send_file(img, mimetype='image/jpeg', as_attachment=True, 
-                        download_name=f'expenses_{period}.jpg')
+        # Image download: JPG unless format=svg/webp/png is asked for
+        spec = charts.chart_spec((10, 6), preferred=(), allowed=('svg', 'webp', 'png', 'jpg'),
+                                 default='jpg', default_dpi=150)
+        with charts.style(plt, spec):
+            plt.figure(figsize=spec['figsize'])
+            if categories:
+                plt.bar(categories, amounts)
+                plt.title(title)
+                plt.xlabel('Category')
+                plt.ylabel(f'Amount ({currency})')
+                plt.xticks(rotation=45)
+                plt.tight_layout()
+            return charts.send_chart(plt, spec, as_attachment=True,
+                                     download_name=f"expenses_{period}.{spec['format']}")
 def send_payment_reminder_console(email, title, amount, date):
     print("\n============================")
     print("📧 REMINDER EMAIL (TEST MODE)")
@@ -931,14 +1622,84 @@ def send_payment_reminder_console(email, title, amount, date):
     print("Reminder: Payment due tomorrow!")
     print("============================\n")
 
-def run_scheduler():
-    with app.app_context():   # ⭐ THIS LINE FIXES EVERYTHING
+def queue_archiving():
+    conn = get_db_connection()
+    enqueue_job(conn, None, 'archive_expenses', {'days': current_app.config['ARCHIVE_AFTER_DAYS']})
+    conn.close()
+
+def queue_forecast_rebuild():
+    conn = get_db_connection()
+    enqueue_job(conn, None, 'rebuild_forecast')
+    conn.close()
+
+# Payment reminders, nightly archiving and forecast rebuilds, and analytics
+# snapshots run on a background thread started explicitly, either by
+# `python app.py` or by `flask run-scheduler` in a separate process. The
+# scheduler also runs the background job worker.
+def run_scheduler(app):
+    import schedule
+
+    schedule.every(1).minutes.do(check_payment_reminders)
+    schedule.every().day.at('03:00').do(queue_archiving)
+    schedule.every().day.at('03:30').do(queue_forecast_rebuild)
+    if app.config['REPLICA_MAX_STALENESS']:
+        schedule.every(app.config['REPLICA_REFRESH_INTERVAL']).seconds.do(replica.refresh_quietly, app)
+    with app.app_context():
+        jobs.start_worker(app, get_db_connection)
         while True:
             schedule.run_pending()
             time.sleep(30)
-schedule.every(1).minutes.do(check_payment_reminders)
 
-threading.Thread(target=run_scheduler, daemon=True).start()
+def start_scheduler(app):
+    import threading
+
+    thread = threading.Thread(target=run_scheduler, args=(app,), daemon=True)
+    thread.start()
+    return thread
+
+@click.command('init-db')
+def init_db_command():
+    """Create or upgrade the database tables."""
+    init_db()
+    click.echo('Initialized the database.')
+
+@click.command('load-rates')
+@click.argument('path', default=DEFAULT_RATES_FILE)
+def load_rates_command(path):
+    """Import exchange rates from a date,currency,per_usd CSV file."""
+    conn = get_db_connection()
+    count = load_rates_file(conn, path)
+    conn.close()
+    click.echo(f'Loaded {count} exchange rates.')
+
+@click.command('run-scheduler')
+def run_scheduler_command():
+    """Send payment reminders and run background jobs in the foreground."""
+    run_scheduler(current_app._get_current_object())
+
+@click.command('archive-expenses')
+@click.option('--days', type=int, help='Archive expenses older than this (default: ARCHIVE_AFTER_DAYS).')
+def archive_expenses_command(days):
+    """Move old expenses into the compressed archive."""
+    conn = get_db_connection()
+    moved = archive_old_expenses(
+        conn, days or current_app.config['ARCHIVE_AFTER_DAYS'],
+        progress=lambda done, total: click.echo(f'\r{done}/{total}', nl=False)
+    )
+    conn.close()
+    click.echo(f'\nArchived {moved} expenses.')
+
+@click.command('rebuild-forecasts')
+def rebuild_forecasts_command():
+    """Recompute spending forecasts for all users from their history."""
+    conn = get_db_connection()
+    count = forecast.rebuild(conn)
+    conn.close()
+    click.echo(f'Rebuilt {count} forecasts.')
 
 if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        init_db()
+    start_scheduler(app)
     app.run(debug=True, use_reloader=False)
@@ -0,0 +1,112 @@
+import json
+import zlib
+from datetime import datetime, timedelta
+
+# Cold storage for old expenses.
+#
+# Expenses older than ARCHIVE_AFTER_DAYS are moved out of the hot `expenses`
+# table into one `expense_archive` row per user and year, holding the rows as
+# zlib-compressed JSON. The hot table (and its indexes) then only covers
+# recent history. Archived rows stay readable through archived_expenses(),
+# which the statistics, export and all-records paths merge back in when their
+# date range reaches past the archive horizon.
+
+ARCHIVE_COLUMNS = ('id', 'user_id', 'amount', 'category', 'description', 'date', 'currency')
+
+# Rows moved per transaction, so the write lock is only held briefly
+ARCHIVE_BATCH_SIZE = 500
+
+
+def archive_cutoff(days):
+    return (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def pack(rows):
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def unpack(payload):
+    return [dict(zip(ARCHIVE_COLUMNS, row)) for row in json.loads(zlib.decompress(payload))]
+
+
+def archive_batch(conn, user_id, year, cutoff):
+    # Move up to ARCHIVE_BATCH_SIZE rows of one user-year into the archive.
+    # Returns the number of rows moved.
+    rows = conn.execute(
+        f'''SELECT {", ".join(ARCHIVE_COLUMNS)} FROM expenses
+            WHERE user_id = ? AND date < ? AND substr(date, 1, 4) = ?
+            ORDER BY id LIMIT ?''',
+        (user_id, cutoff, str(year), ARCHIVE_BATCH_SIZE)
+    ).fetchall()
+    if not rows:
+        return 0
+
+    existing = conn.execute(
+        'SELECT payload FROM expense_archive WHERE user_id = ? AND year = ?',
+        (user_id, year)
+    ).fetchone()
+    archived = json.loads(zlib.decompress(existing[0])) if existing else []
+    archived.extend(list(row) for row in rows)
+
+    conn.execute(
+        '''INSERT OR REPLACE INTO expense_archive (user_id, year, row_count, payload)
+           VALUES (?, ?, ?, ?)''',
+        (user_id, year, len(archived), pack(archived))
+    )
+    conn.executemany('DELETE FROM expenses WHERE id = ?', [(row[0],) for row in rows])
+    # The deletes left sync tombstones (sync.py); the rows still exist
+    conn.executemany(
+        '''UPDATE changes SET deleted = 0, archived = 1
+           WHERE user_id = ? AND entity = 'expense' AND entity_id = ?''',
+        [(user_id, row[0]) for row in rows]
+    )
+    conn.commit()
+    return len(rows)
+
+
+def archive_old_expenses(conn, days, progress=None):
+    # Archive everything older than `days`, one user-year batch at a time
+    cutoff = archive_cutoff(days)
+    groups = conn.execute(
+        '''SELECT user_id, CAST(substr(date, 1, 4) AS INTEGER) AS year, COUNT(*)
+           FROM expenses WHERE date < ?
+           GROUP BY user_id, year''',
+        (cutoff,)
+    ).fetchall()
+    total = sum(count for _, _, count in groups)
+    moved = 0
+    for user_id, year, _ in groups:
+        while True:
+            count = archive_batch(conn, user_id, year, cutoff)
+            if not count:
+                break
+            moved += count
+            if progress:
+                progress(moved, total)
+    return moved
+
+
+def archived_expenses(conn, user_id, since=None, until=None):
+    # Archived rows for a user, optionally limited to a date range (inclusive
+    # 'YYYY-MM-DD[ HH:MM:SS]' strings), newest first like the hot queries
+    query = 'SELECT payload FROM expense_archive WHERE user_id = ?'
+    params = [user_id]
+    if since:
+        query += ' AND year >= ?'
+        params.append(int(since[:4]))
+    if until:
+        query += ' AND year <= ?'
+        params.append(int(until[:4]))
+
+    rows = []
+    for (payload,) in conn.execute(query, params):
+        for row in unpack(payload):
+            if since and row['date'] < since:
+                continue
+            if until and row['date'] > until:
+                continue
+            row['archived'] = True
+            rows.append(row)
+    rows.sort(key=lambda r: r['date'], reverse=True)
+    return rows
+
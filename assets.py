@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import json
+import os
+import click
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are built and served
+    brotli = None
+
+# Static asset pipeline.
+#
+# `flask build-assets` copies every CSS/JS file under static/ to static/dist/
+# with a content hash in its name, writes gzip and brotli variants next to it
+# and records the mapping in static/dist/manifest.json. Templates link assets
+# through asset_url(), which returns the fingerprinted /assets/... URL once a
+# manifest exists and the plain /static/... URL otherwise, so development
+# works without a build.
+
+ASSET_EXTENSIONS = ('.css', '.js')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# HTML smaller than this is not worth compressing
+MIN_COMPRESS_SIZE = 500
+
+bp = Blueprint('assets', __name__)
+
+
+def dist_folder(app):
+    return os.path.join(app.static_folder, 'dist')
+
+
+def fingerprint(path, content):
+    root, ext = os.path.splitext(path)
+    return f'{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+
+
+def build_assets(app):
+    static = app.static_folder
+    dist = dist_folder(app)
+    manifest = {}
+    for folder, dirs, files in os.walk(static):
+        dirs[:] = [d for d in dirs if os.path.join(folder, d) != dist]
+        for name in files:
+            if not name.endswith(ASSET_EXTENSIONS):
+                continue
+            source = os.path.join(folder, name)
+            logical = os.path.relpath(source, static).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                content = f.read()
+            hashed = fingerprint(logical, content)
+            target = os.path.join(dist, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(content)
+            with open(target + '.gz', 'wb') as f:
+                f.write(gzip.compress(content, 9, mtime=0))
+            if brotli is not None:
+                with open(target + '.br', 'wb') as f:
+                    f.write(brotli.compress(content, quality=11))
+            manifest[logical] = hashed
+    with open(os.path.join(dist, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    app.extensions.pop('asset_manifest', None)
+    return manifest
+
+
+def load_manifest(app):
+    if 'asset_manifest' not in app.extensions:
+        try:
+            with open(os.path.join(dist_folder(app), 'manifest.json')) as f:
+                app.extensions['asset_manifest'] = json.load(f)
+        except FileNotFoundError:
+            app.extensions['asset_manifest'] = {}
+    return app.extensions['asset_manifest']
+
+
+def asset_url(path):
+    hashed = load_manifest(current_app).get(path)
+    if hashed is None:
+        return url_for('static', filename=path)
+    return url_for('assets.asset', filename=hashed)
+
+
+def accepted_encodings():
+    return {e.split(';')[0].strip() for e in request.headers.get('Accept-Encoding', '').split(',')}
+
+
+@bp.route('/assets/<path:filename>')
+def asset(filename):
+    # Fingerprinted files never change, so clients may cache them forever.
+    # Serve the smallest precompressed variant the client accepts.
+    dist = dist_folder(current_app)
+    encodings = accepted_encodings()
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in encodings and os.path.isfile(os.path.join(dist, filename + suffix)):
+            response = send_from_directory(dist, filename + suffix, max_age=31536000)
+            response.headers['Content-Encoding'] = encoding
+            response.mimetype = 'text/css' if filename.endswith('.css') else 'text/javascript'
+            break
+    else:
+        response = send_from_directory(dist, filename, max_age=31536000)
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def compress_html(response):
+    if (response.mimetype != 'text/html' or response.status_code != 200
+            or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_SIZE:
+        return response
+    encodings = accepted_encodings()
+    if brotli is not None and 'br' in encodings:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif 'gzip' in encodings:
+        response.set_data(gzip.compress(body, 6))
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@click.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress static CSS/JS into static/dist."""
+    manifest = build_assets(current_app)
+    click.echo(f'Built {len(manifest)} assets{"" if brotli else " (brotli not installed, gzip only)"}.')
+
+
+def init_app(app):
+    app.register_blueprint(bp)
+    app.add_template_global(asset_url)
+    app.after_request(compress_html)
+    app.cli.add_command(build_assets_command)
@@ -0,0 +1,90 @@
+"""Cold-start benchmark for the Flask app.
+
+Runs each measurement in a fresh interpreter so nothing is cached:
+
+    python benchmarks/startup.py            # 5 runs, summary only
+    python benchmarks/startup.py -n 10 --top 15
+
+Reports the `import app` time from `python -X importtime` (with the slowest
+modules), and the time from interpreter start to the first served request.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_REQUEST = '''
+import time
+t0 = time.perf_counter()
+import app
+flask_app = app.create_app({'DATABASE': %(db)r, 'TESTING': True})
+with flask_app.app_context():
+    app.init_db()
+response = flask_app.test_client().get('/login')
+assert response.status_code == 200, response.status_code
+print(time.perf_counter() - t0)
+'''
+
+
+def import_times():
+    # Parse "import time: self [us] | cumulative | name" lines from stderr.
+    # Nesting is shown by indenting the name two spaces per level, and a
+    # module's children are printed before the module itself.
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative_us), name.strip()))
+        elif depth == 0:
+            if name.strip() == 'app':
+                return int(cumulative_us), children
+            children = []
+    raise RuntimeError('app import not found in -X importtime output')
+
+
+def first_request_time(db):
+    result = subprocess.run(
+        [sys.executable, '-c', FIRST_REQUEST % {'db': db}],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list')
+    args = parser.parse_args()
+
+    import_runs = []
+    request_runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'bench.db')
+        for _ in range(args.runs):
+            total, modules = import_times()
+            import_runs.append(total / 1e6)
+            request_runs.append(first_request_time(db))
+
+    print(f'import app:          median {statistics.median(import_runs) * 1000:8.1f} ms '
+          f'(min {min(import_runs) * 1000:.1f} ms, {args.runs} runs)')
+    print(f'time to 1st request: median {statistics.median(request_runs) * 1000:8.1f} ms '
+          f'(min {min(request_runs) * 1000:.1f} ms, {args.runs} runs)')
+
+    print('\nslowest imports under app (last run, cumulative):')
+    for cumulative, name in sorted(modules, reverse=True)[:args.top]:
+        print(f'  {cumulative / 1000:8.1f} ms  {name}')
+
+
+if __name__ == '__main__':
+    main()
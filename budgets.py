@@ -0,0 +1,149 @@
+from archive import archived_expenses
+from currency import total_in_currency
+from events import bus
+from forecast import projected_total
+from money import format_money
+
+# Month-to-date spend counters and budget threshold alerts.
+#
+# budget_progress keeps one row per user and month with the amount spent so
+# far, in minor units of the user's currency. Every expense write adjusts it
+# in the same transaction with record_spend(), so checking a budget never
+# re-aggregates the month. A missing row is rebuilt from the expenses (and
+# the archive) the first time it is needed; deleting rows is therefore always
+# a safe way to invalidate counters. Each change also carries the projected
+# month-end total from forecast.py.
+#
+# After the write commits, publish() compares the counter before and after
+# against the month's budget and pushes a 'budget' event with the new state,
+# plus a 'budget_alert' event when a threshold was crossed on the way up.
+
+
+def month_of(date):
+    # (year, month) of a 'YYYY-MM-DD[ HH:MM:SS]' string
+    return int(date[:4]), int(date[5:7])
+
+
+def month_range(year, month):
+    start = f'{year:04d}-{month:02d}-01'
+    end = f'{year + 1:04d}-01-01' if month == 12 else f'{year:04d}-{month + 1:02d}-01'
+    return start, end
+
+
+def month_spent(conn, user_id, year, month, currency):
+    # Full recount of one month in the given currency
+    start, end = month_range(year, month)
+    rows = conn.execute(
+        '''SELECT COALESCE(currency, ?) AS currency, substr(date, 1, 10) AS day, SUM(amount) AS total
+           FROM expenses
+           WHERE user_id = ? AND date >= ? AND date < ?
+           GROUP BY 1, day''',
+        (currency, user_id, start, end)
+    ).fetchall()
+    rows += [
+        {'currency': e['currency'] or currency, 'day': e['date'][:10], 'total': e['amount']}
+        for e in archived_expenses(conn, user_id, since=start, until=f'{start[:7]}-31 23:59:59')
+    ]
+    return total_in_currency(conn, rows, currency)
+
+
+def get_spent(conn, user_id, year, month, currency):
+    row = conn.execute(
+        'SELECT spent FROM budget_progress WHERE user_id = ? AND year = ? AND month = ?',
+        (user_id, year, month)
+    ).fetchone()
+    if row:
+        return row[0]
+    spent = month_spent(conn, user_id, year, month, currency)
+    conn.execute(
+        'INSERT OR IGNORE INTO budget_progress (user_id, year, month, spent) VALUES (?, ?, ?, ?)',
+        (user_id, year, month, spent)
+    )
+    conn.commit()
+    return spent
+
+
+def get_budget(conn, user_id, year, month):
+    row = conn.execute(
+        'SELECT amount FROM budget WHERE user_id = ? AND year = ? AND month = ?',
+        (user_id, year, month)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def record_spend(conn, user_id, date, delta, currency):
+    # Add delta (minor units of the user's currency) to the month of `date`.
+    # Call after the expense itself has been written and before committing.
+    # Returns the change for publish().
+    year, month = month_of(date)
+    cur = conn.execute(
+        'UPDATE budget_progress SET spent = spent + ? WHERE user_id = ? AND year = ? AND month = ?',
+        (delta, user_id, year, month)
+    )
+    if cur.rowcount:
+        after = conn.execute(
+            'SELECT spent FROM budget_progress WHERE user_id = ? AND year = ? AND month = ?',
+            (user_id, year, month)
+        ).fetchone()[0]
+    else:
+        # The recount already sees the expense written in this transaction
+        after = month_spent(conn, user_id, year, month, currency)
+        conn.execute(
+            'INSERT OR IGNORE INTO budget_progress (user_id, year, month, spent) VALUES (?, ?, ?, ?)',
+            (user_id, year, month, after)
+        )
+    return {
+        'year': year, 'month': month, 'currency': currency,
+        'before': after - delta, 'spent': after,
+        'budget': get_budget(conn, user_id, year, month),
+        'projected': projected_total(conn, user_id, year, month, after),
+    }
+
+
+def reset(conn, user_id):
+    # Forget a user's counters, e.g. after their expenses were deleted or
+    # their currency changed. They are recounted on next use.
+    conn.execute('DELETE FROM budget_progress WHERE user_id = ?', (user_id,))
+
+
+def crossed(before, after, budget, thresholds):
+    # Thresholds (percent of budget) passed while going from before to after
+    if not budget or budget <= 0:
+        return []
+    return [t for t in thresholds if before * 100 < t * budget <= after * 100]
+
+
+def state(change):
+    # JSON-ready budget state for the page, with amounts already formatted
+    spent, budget, currency = change['spent'], change['budget'], change['currency']
+    data = {
+        'year': change['year'],
+        'month': change['month'],
+        'currency': currency,
+        'spent': format_money(spent, currency),
+        'budget': None,
+        'remaining': None,
+        'over': False,
+        'percentage': None,
+        'projected': format_money(change['projected'], currency),
+        'projected_over': False,
+    }
+    if budget is not None:
+        data.update(
+            budget=format_money(budget, currency),
+            remaining=format_money(budget - spent, currency),
+            over=spent > budget,
+            percentage=round(spent * 100 / budget, 1) if budget > 0 else 0,
+            projected_over=change['projected'] > budget,
+        )
+    return data
+
+
+def publish(user_id, change, thresholds):
+    # Push the new state and any threshold crossing to the user's open pages.
+    # Call after commit so listeners never see an uncommitted state.
+    data = state(change)
+    bus.publish(user_id, 'budget', data)
+    passed = crossed(change['before'], change['spent'], change['budget'], thresholds)
+    if passed:
+        bus.publish(user_id, 'budget_alert', {**data, 'threshold': max(passed)})
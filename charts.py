@@ -0,0 +1,156 @@
+import io
+import threading
+from contextlib import contextmanager
+from flask import request, send_file
+
+# Output options for the matplotlib chart routes.
+#
+# A chart can be asked for with ?format=svg|webp|png, ?width=<pixels> and
+# ?dpi=<dots per inch>. Without an explicit format it is picked from the
+# Accept header: only types the client lists by name count, so a bare */*
+# (scripts, old clients) still gets PNG. SVG is written with real <text>
+# elements and simplified paths, which keeps simple bar and pie charts to a
+# few kilobytes. ?thumbnail=1 renders a small PNG without antialiasing, which
+# is faster and compresses better, for pages that show many charts. It is
+# never wider than the chart's normal render and is not negotiated: lossy
+# WebP makes the hard edges larger, not smaller.
+
+MIMETYPES = {
+    'svg': 'image/svg+xml',
+    'webp': 'image/webp',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+}
+
+MIN_WIDTH, MAX_WIDTH = 160, 2400
+MIN_DPI, MAX_DPI = 36, 300
+DEFAULT_DPI = 100
+THUMBNAIL_WIDTH = 640
+THUMBNAIL_DPI = 72
+
+SVG_STYLE = {
+    'svg.fonttype': 'none',            # text as <text>, not glyph outlines
+    'svg.hashsalt': 'expense-tracker',  # stable ids, so output is repeatable
+    'path.simplify': True,
+    'path.simplify_threshold': 1.0,
+}
+THUMBNAIL_STYLE = {
+    'lines.antialiased': False,
+    'patch.antialiased': False,
+    'text.antialiased': False,
+}
+
+_webp = None
+
+# pyplot's current figure and rcParams are process-wide, and requests run on
+# several threads: hold this from the first plt call until the figure is
+# saved, or concurrent renders draw into each other's figures and restore
+# each other's settings
+render_lock = threading.Lock()
+
+
+def webp_supported():
+    # WebP needs a matplotlib that can write it and a Pillow built with it
+    global _webp
+    if _webp is None:
+        try:
+            from matplotlib.backend_bases import FigureCanvasBase
+            from PIL import features
+            _webp = 'webp' in FigureCanvasBase.get_supported_filetypes() and features.check('webp')
+        except ImportError:
+            _webp = False
+    return _webp
+
+
+def clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def negotiate(preferred, default):
+    # First preferred format the client's Accept header names explicitly
+    listed = {mimetype for mimetype, quality in request.accept_mimetypes if quality > 0}
+    for fmt in preferred:
+        if MIMETYPES[fmt] in listed and (fmt != 'webp' or webp_supported()):
+            return fmt
+    return default
+
+
+def chart_spec(figsize, preferred=('svg', 'webp', 'png'), allowed=('svg', 'webp', 'png'),
+               default='png', default_dpi=DEFAULT_DPI):
+    # Work out format, size and resolution for one chart request. `figsize`
+    # is the chart's natural size in inches; only its aspect ratio is kept.
+    thumbnail = request.args.get('thumbnail') == '1'
+
+    fmt = request.args.get('format', '').lower()
+    negotiated = False
+    if fmt not in allowed:
+        if thumbnail:
+            fmt = 'png'
+        else:
+            fmt = negotiate(preferred, default)
+            negotiated = True
+    if fmt == 'webp' and not webp_supported():
+        fmt = 'png'
+
+    dpi = clamp(request.args.get('dpi', type=int) or (THUMBNAIL_DPI if thumbnail else default_dpi),
+                MIN_DPI, MAX_DPI)
+    natural_width = figsize[0] * default_dpi
+    width = clamp(request.args.get('width', type=int)
+                  or (min(THUMBNAIL_WIDTH, natural_width) if thumbnail else figsize[0] * dpi),
+                  MIN_WIDTH, MAX_WIDTH)
+    return {
+        'format': fmt,
+        'dpi': dpi,
+        'figsize': (width / dpi, width / dpi * figsize[1] / figsize[0]),
+        'thumbnail': thumbnail,
+        'negotiated': negotiated,
+    }
+
+
+@contextmanager
+def style(plt, spec):
+    # Wrap figure creation and saving so the chosen mode applies to both.
+    # Renders one chart at a time (see render_lock).
+    rc = {}
+    if spec['format'] == 'svg':
+        rc.update(SVG_STYLE)
+    if spec['thumbnail']:
+        rc.update(THUMBNAIL_STYLE)
+    with render_lock, plt.rc_context(rc):
+        yield
+
+
+def palette_png(img):
+    # Without antialiasing a chart has only a handful of colours, so an
+    # exact 8-bit palette PNG is about half the size of the RGBA one
+    from PIL import Image
+    image = Image.open(img).convert('RGB')
+    colors = image.getcolors(256)
+    if colors is None:
+        img.seek(0)
+        return img
+    out = io.BytesIO()
+    image.quantize(colors=len(colors)).save(out, 'PNG', optimize=True)
+    out.seek(0)
+    return out
+
+
+def send_chart(plt, spec, **kwargs):
+    # Save the current figure in the requested format and send it
+    options = {'format': spec['format'], 'dpi': spec['dpi']}
+    if spec['format'] == 'svg':
+        options['metadata'] = {'Date': None}
+    elif spec['format'] in ('webp', 'jpg'):
+        options['pil_kwargs'] = {'quality': 85}
+
+    img = io.BytesIO()
+    plt.savefig(img, **options)
+    img.seek(0)
+    plt.close()
+    if spec['thumbnail'] and spec['format'] == 'png':
+        img = palette_png(img)
+
+    response = send_file(img, mimetype=MIMETYPES[spec['format']], **kwargs)
+    if spec['negotiated']:
+        response.vary.add('Accept')
+    return response
@@ -0,0 +1,189 @@
+import csv
+import os
+import threading
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from money import Money, scale_of
+
+# NumPy is imported inside the functions that need it so that importing this
+# module (and the app) stays cheap until the first conversion.
+
+# Rates are stored as "units of currency per 1 USD" for each date, so any
+# pair can be converted through USD without storing every combination.
+BASE_CURRENCY = 'USD'
+SUPPORTED_CURRENCIES = ['USD', 'EUR', 'GBP', 'INR', 'JPY']
+
+DEFAULT_RATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'exchange_rates.csv')
+
+# Seconds a cached rate table is trusted before checking whether another
+# process (e.g. `flask load-rates`) has imported new rates
+RATE_CHECK_INTERVAL = 5
+
+
+class RateCache:
+    # In-memory copy of the exchange_rates table. Loaded on first use and
+    # dropped whenever new rates are imported: directly in the importing
+    # process, and in every other process once a cheap signature of the
+    # table (checked at most every RATE_CHECK_INTERVAL seconds) changes.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._table = None
+        self._signature = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._table = None
+
+    def _current_signature(self, conn):
+        # Row count, newest date and sum of rates; re-importing a day with
+        # new values changes the sum
+        return tuple(conn.execute(
+            'SELECT COUNT(*), MAX(rate_date), TOTAL(per_usd) FROM exchange_rates'
+        ).fetchone())
+
+    def _load(self, conn):
+        import numpy as np
+
+        table = {}
+        rows = conn.execute(
+            'SELECT currency, rate_date, per_usd FROM exchange_rates ORDER BY currency, rate_date'
+        ).fetchall()
+        for currency, rate_date, per_usd in rows:
+            dates, rates = table.setdefault(currency, ([], []))
+            dates.append(rate_date)
+            rates.append(per_usd)
+        return {
+            currency: (np.array(dates), np.array(rates, dtype=float))
+            for currency, (dates, rates) in table.items()
+        }
+
+    def table(self, conn):
+        with self._lock:
+            now = time.monotonic()
+            if self._table is not None and now - self._checked_at >= RATE_CHECK_INTERVAL:
+                if self._current_signature(conn) != self._signature:
+                    self._table = None
+                self._checked_at = now
+            if self._table is None:
+                self._signature = self._current_signature(conn)
+                self._table = self._load(conn)
+                self._checked_at = now
+            return self._table
+
+    def rate(self, conn, currency, on_date):
+        # Latest rate published on or before the date; falls back to the
+        # earliest known rate for dates before the table starts.
+        import numpy as np
+
+        if currency == BASE_CURRENCY:
+            return 1.0
+        entry = self.table(conn).get(currency)
+        if entry is None:
+            raise ValueError(f'No exchange rate for {currency}')
+        dates, rates = entry
+        i = np.searchsorted(dates, on_date[:10], side='right') - 1
+        return float(rates[max(i, 0)])
+
+    def convert(self, conn, money, to_currency, on_date):
+        # Money in another currency, rounded to that currency's minor unit
+        if money.currency == to_currency:
+            return money
+        factor = (Decimal(repr(self.rate(conn, to_currency, on_date)))
+                  / Decimal(repr(self.rate(conn, money.currency, on_date))))
+        minor = (money.to_decimal() * factor).scaleb(scale_of(to_currency))
+        return Money(minor.quantize(Decimal(1), rounding=ROUND_HALF_UP), to_currency)
+
+    def _rates_for(self, conn, currencies, dates):
+        # Per-row "per USD" rate for parallel arrays of currencies and dates
+        import numpy as np
+
+        result = np.ones(len(currencies), dtype=float)
+        table = self.table(conn)
+        for currency in np.unique(currencies):
+            if currency == BASE_CURRENCY:
+                continue
+            if currency not in table:
+                raise ValueError(f'No exchange rate for {currency}')
+            rate_dates, rates = table[currency]
+            mask = currencies == currency
+            idx = np.searchsorted(rate_dates, dates[mask], side='right') - 1
+            result[mask] = rates[np.clip(idx, 0, None)]
+        return result
+
+    def convert_many(self, conn, amounts, currencies, dates, to_currency):
+        # Convert a whole result set of minor-unit amounts in one pass. The
+        # result is in the target currency's minor units, unrounded so callers
+        # can sum before rounding. Rows already in the target currency are
+        # left untouched.
+        import numpy as np
+
+        amounts = np.asarray(amounts, dtype=float)
+        currencies = np.asarray(currencies, dtype=str)
+        dates = np.array([d[:10] for d in dates], dtype=str)
+        foreign = currencies != to_currency
+        if not foreign.any():
+            return amounts
+        result = amounts.copy()
+        from_rates = self._rates_for(conn, currencies[foreign], dates[foreign])
+        to_rates = self._rates_for(conn, np.full(foreign.sum(), to_currency), dates[foreign])
+        scale_shift = np.array([scale_of(to_currency) - scale_of(c) for c in currencies[foreign]])
+        result[foreign] = amounts[foreign] * to_rates / from_rates * 10.0 ** scale_shift
+        return result
+
+
+rates = RateCache()
+
+
+def load_rates_file(conn, path):
+    # Import a CSV with date,currency,per_usd columns. Existing rates for the
+    # same day are replaced so a file can be re-imported safely.
+    with open(path, newline='') as f:
+        rows = [
+            (row['date'][:10], row['currency'].upper(), float(row['per_usd']))
+            for row in csv.DictReader(f)
+        ]
+    conn.executemany(
+        'INSERT OR REPLACE INTO exchange_rates (rate_date, currency, per_usd) VALUES (?, ?, ?)',
+        rows
+    )
+    conn.commit()
+    rates.invalidate()
+    return len(rows)
+
+
+def sum_by_key(conn, rows, to_currency, key='category'):
+    # Collapse (key, currency, day, total) rows into per-key totals in the
+    # target currency, as integer minor units
+    import numpy as np
+
+    if not rows:
+        return []
+    keys = np.array([r[key] for r in rows], dtype=object)
+    converted = rates.convert_many(
+        conn,
+        [r['total'] for r in rows],
+        [r['currency'] for r in rows],
+        [r['day'] for r in rows],
+        to_currency
+    )
+    unique_keys, inverse = np.unique(keys.astype(str), return_inverse=True)
+    totals = np.bincount(inverse, weights=converted, minlength=len(unique_keys))
+    return [{key: k, 'total': int(np.rint(t))} for k, t in zip(unique_keys, totals)]
+
+
+def total_in_currency(conn, rows, to_currency):
+    # Grand total of (currency, day, total) rows in the target currency, as
+    # integer minor units
+    if not rows:
+        return 0
+    total = rates.convert_many(
+        conn,
+        [r['total'] for r in rows],
+        [r['currency'] for r in rows],
+        [r['day'] for r in rows],
+        to_currency
+    ).sum()
+    return int(round(float(total)))
+
@@ -0,0 +1,74 @@
+import itertools
+import json
+import queue
+import threading
+from collections import deque
+
+# In-process publish/subscribe bus for pushing events to open pages over
+# Server-Sent Events (the /events route).
+#
+# Each subscriber gets its own queue. The last few events per user are kept
+# so a browser that reconnects with Last-Event-ID gets what it missed. Events
+# only reach pages connected to the same process; with several workers a
+# client simply sees the state on its next event or page load.
+
+HEARTBEAT_INTERVAL = 15     # seconds between keep-alive comments
+RETRY_MS = 5000             # how long browsers wait before reconnecting
+REPLAY_SIZE = 50            # recent events kept per user for reconnects
+
+
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._subscribers = {}
+        self._recent = {}
+
+    def publish(self, user_id, event, data):
+        with self._lock:
+            message = (next(self._ids), event, data)
+            self._recent.setdefault(user_id, deque(maxlen=REPLAY_SIZE)).append(message)
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for q in subscribers:
+            q.put(message)
+
+    def subscribe(self, user_id, last_event_id=None):
+        q = queue.Queue()
+        with self._lock:
+            if last_event_id is not None:
+                for message in self._recent.get(user_id, ()):
+                    if message[0] > last_event_id:
+                        q.put(message)
+            self._subscribers.setdefault(user_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+
+bus = EventBus()
+
+
+def format_sse(event_id, event, data):
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def stream(user_id, last_event_id=None):
+    # Generator for a text/event-stream response. Sends a comment as a
+    # heartbeat when idle so proxies keep the connection open and dead
+    # clients are noticed.
+    q = bus.subscribe(user_id, last_event_id)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        while True:
+            try:
+                yield format_sse(*q.get(timeout=HEARTBEAT_INTERVAL))
+            except queue.Empty:
+                yield ': heartbeat\n\n'
+    finally:
+        bus.unsubscribe(user_id, q)
@@ -0,0 +1,285 @@
+import calendar
+import json
+import math
+from datetime import date as date_type
+from archive import archived_expenses
+from currency import rates
+
+# Spending forecasts and unusual-charge detection, per user and category.
+#
+# Each (user, category) keeps a small streaming state in `forecast_state`,
+# in minor units of the user's currency:
+#   n, mean, var          EWMA of single transaction amounts, used to flag
+#                         a new charge far above what is usual
+#   month, month_total    the latest month with spending and its total so far
+#   months, monthly_mean  EWMA of completed monthly totals (empty months
+#                         count as zero)
+#   weights               spend by day of month, decayed each month, giving
+#                         the usual shape of a month
+# observe() updates it in O(1) on every new expense. The projected month-end
+# total is the month-to-date spend plus, per category, the usual monthly
+# total times the share of it that usually falls after today.
+#
+# Edits and deletes only correct the current month's total and day weights;
+# the transaction EWMA cannot be un-applied. rebuild() recomputes everything
+# from history with NumPy and runs nightly, which also repairs that drift.
+
+ALPHA = 0.1              # weight of a new transaction in the amount EWMA
+MONTH_ALPHA = 0.3        # weight of a completed month in the monthly EWMA
+DAY_DECAY = 0.7          # day-of-month weights kept per month that passes
+
+ANOMALY_Z = 3.0          # standard deviations above the mean to flag
+MIN_HISTORY = 5          # transactions seen before anything is flagged
+MIN_STD_RATIO = 0.25     # floor on the deviation, as a share of the mean
+
+DAYS = 31
+
+
+def month_index(date):
+    # 'YYYY-MM-DD...' -> months since year 0, so months subtract cleanly
+    return int(date[:4]) * 12 + int(date[5:7]) - 1
+
+
+def new_state(month):
+    return {'n': 0, 'mean': 0.0, 'var': 0.0, 'month': month, 'month_total': 0.0,
+            'months': 0, 'monthly_mean': 0.0, 'weights': [0.0] * DAYS}
+
+
+def roll(state, month):
+    # State moved forward to `month`: the months in between are folded into
+    # the monthly EWMA and the day weights decay
+    gap = month - state['month']
+    if gap <= 0:
+        return state
+    state = dict(state)
+    if state['months'] == 0:
+        state['monthly_mean'] = state['month_total']
+    else:
+        state['monthly_mean'] += MONTH_ALPHA * (state['month_total'] - state['monthly_mean'])
+    # Empty months in between pull the mean towards zero
+    state['monthly_mean'] *= (1 - MONTH_ALPHA) ** (gap - 1)
+    state['months'] += gap
+    state['weights'] = [w * DAY_DECAY ** gap for w in state['weights']]
+    state['month'] = month
+    state['month_total'] = 0.0
+    return state
+
+
+def check(state, amount):
+    # Is `amount` unusually high for this category? Returns the usual
+    # amount if so, otherwise None.
+    if state['n'] < MIN_HISTORY or amount <= state['mean']:
+        return None
+    std = max(math.sqrt(state['var']), MIN_STD_RATIO * state['mean'], 1)
+    if (amount - state['mean']) / std > ANOMALY_Z:
+        return state['mean']
+    return None
+
+
+def add_amount(state, amount):
+    # Fold one transaction into the amount EWMA (West's update)
+    if state['n'] == 0:
+        state['mean'] = float(amount)
+    else:
+        diff = amount - state['mean']
+        incr = ALPHA * diff
+        state['mean'] += incr
+        state['var'] = (1 - ALPHA) * (state['var'] + diff * incr)
+    state['n'] += 1
+
+
+def load(conn, user_id, category=None):
+    query = 'SELECT * FROM forecast_state WHERE user_id = ?'
+    params = [user_id]
+    if category is not None:
+        query += ' AND category = ?'
+        params.append(category)
+    states = {}
+    for row in conn.execute(query, params):
+        state = {k: row[k] for k in ('n', 'mean', 'var', 'month', 'month_total', 'months', 'monthly_mean')}
+        state['weights'] = json.loads(row['weights'])
+        states[row['category']] = state
+    return states
+
+
+def save(conn, user_id, category, state):
+    conn.execute(
+        '''INSERT OR REPLACE INTO forecast_state
+           (user_id, category, n, mean, var, month, month_total, months, monthly_mean, weights)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        (user_id, category, state['n'], state['mean'], state['var'], state['month'],
+         state['month_total'], state['months'], state['monthly_mean'], json.dumps(state['weights']))
+    )
+
+
+def observe(conn, user_id, category, amount, date):
+    # Record a new expense (`amount` in minor units of the user's currency)
+    # and return the usual amount for the category if this one is unusually
+    # high, otherwise None. Runs inside the caller's transaction.
+    month = month_index(date)
+    state = load(conn, user_id, category).get(category) or new_state(month)
+    usual = check(state, amount)
+    state = roll(state, month)
+    add_amount(state, amount)
+    if state['month'] == month:
+        state['month_total'] += amount
+        state['weights'][int(date[8:10]) - 1] += amount
+    save(conn, user_id, category, state)
+    return usual
+
+
+def adjust(conn, user_id, category, date, delta):
+    # An existing expense changed by `delta`; only the month being tracked
+    # can be corrected
+    state = load(conn, user_id, category).get(category)
+    if state is None or state['month'] != month_index(date):
+        return
+    day = int(date[8:10]) - 1
+    state['month_total'] = max(state['month_total'] + delta, 0.0)
+    state['weights'][day] = max(state['weights'][day] + delta, 0.0)
+    save(conn, user_id, category, state)
+
+
+def reset(conn, user_id):
+    conn.execute('DELETE FROM forecast_state WHERE user_id = ?', (user_id,))
+
+
+def expected_remaining(state, day, days_in_month):
+    # Spend still expected in the category after `day` of the month
+    if day >= days_in_month:
+        return 0.0
+    if state['months'] == 0:
+        # Only this month so far: extrapolate its run rate
+        return state['month_total'] * (days_in_month - day) / day if day else 0.0
+    # Days past the end of a short month count towards its last day
+    weights = state['weights'][:days_in_month]
+    weights[-1] += sum(state['weights'][days_in_month:])
+    total = sum(weights)
+    share = sum(weights[day:]) / total if total else (days_in_month - day) / days_in_month
+    return state['monthly_mean'] * share
+
+
+def projected_total(conn, user_id, year, month, spent, today=None):
+    # Expected month-end spend given `spent` so far (minor units of the
+    # user's currency)
+    today = today or date_type.today()
+    target = year * 12 + month - 1
+    current = today.year * 12 + today.month - 1
+    days_in_month = calendar.monthrange(year, month)[1]
+    if target < current:
+        return spent
+    day = today.day if target == current else 0
+
+    remaining = 0.0
+    for state in load(conn, user_id).values():
+        if state['month'] <= target:
+            remaining += expected_remaining(roll(state, target), day, days_in_month)
+    return spent + int(round(remaining))
+
+
+def rebuild(conn, user_ids=None):
+    # Recompute every state from the full history (including the archive)
+    # for the given users, or everyone. Returns the number of states written.
+    import numpy as np
+
+    query = 'SELECT id, currency FROM users'
+    if user_ids is not None:
+        query += f' WHERE id IN ({", ".join("?" * len(user_ids))})'
+    users = dict(conn.execute(query, list(user_ids or ())).fetchall())
+
+    # Every expense, converted to its owner's currency one currency at a time
+    user_col, categories, amounts, dates = [], [], [], []
+    for currency in set(users.values()):
+        ids = [uid for uid, c in users.items() if c == currency]
+        rows = [tuple(r) for r in conn.execute(
+            f'''SELECT user_id, category, amount, COALESCE(currency, ?), date FROM expenses
+                WHERE user_id IN ({", ".join("?" * len(ids))})''',
+            [currency, *ids]
+        )]
+        for uid in ids:
+            rows += [(uid, e['category'], e['amount'], e['currency'] or currency, e['date'])
+                     for e in archived_expenses(conn, uid)]
+        if not rows:
+            continue
+        user_col += [r[0] for r in rows]
+        categories += [r[1] for r in rows]
+        dates += [r[4] for r in rows]
+        amounts.append(rates.convert_many(conn, [r[2] for r in rows], [r[3] for r in rows],
+                                          [r[4] for r in rows], currency))
+
+    if user_ids is None:
+        conn.execute('DELETE FROM forecast_state')
+    else:
+        for uid in users:
+            reset(conn, uid)
+    if not user_col:
+        conn.commit()
+        return 0
+
+    values = np.concatenate(amounts)
+    keys = {}
+    group = np.array([keys.setdefault(key, len(keys)) for key in zip(user_col, categories)])
+    # Sort by group, then date
+    date_codes = np.unique(np.array(dates), return_inverse=True)[1]
+    order = np.lexsort((date_codes, group))
+    group, values = group[order], values[order]
+    dates = np.array(dates)[order]
+    months = np.array([int(d[:4]) * 12 + int(d[5:7]) - 1 for d in dates])
+    days = np.array([int(d[8:10]) - 1 for d in dates])
+
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    counts = np.diff(np.r_[starts, len(group)])
+    g = len(starts)
+
+    # Amount EWMA, all groups in lockstep over their k-th transaction
+    mean, var = np.zeros(g), np.zeros(g)
+    for k in range(counts.max()):
+        active = np.flatnonzero(counts > k)
+        x = values[starts[active] + k]
+        if k == 0:
+            mean[active] = x
+        else:
+            diff = x - mean[active]
+            incr = ALPHA * diff
+            mean[active] += incr
+            var[active] = (1 - ALPHA) * (var[active] + diff * incr)
+
+    # Monthly totals per group, then the monthly EWMA in lockstep over each
+    # group's k-th month with spending
+    month_key = np.r_[True, (group[1:] != group[:-1]) | (months[1:] != months[:-1])]
+    month_starts = np.flatnonzero(month_key)
+    month_totals = np.add.reduceat(values, month_starts)
+    month_group, month_of = group[month_starts], months[month_starts]
+    group_month_starts = np.flatnonzero(np.r_[True, month_group[1:] != month_group[:-1]])
+    month_counts = np.diff(np.r_[group_month_starts, len(month_group)])
+
+    current = month_of[group_month_starts]
+    total = month_totals[group_month_starts]
+    seen = np.zeros(g, dtype=int)
+    monthly_mean = np.zeros(g)
+    for k in range(1, month_counts.max()):
+        active = np.flatnonzero(month_counts > k)
+        i = group_month_starts[active] + k
+        gap = month_of[i] - current[active]
+        folded = np.where(seen[active] == 0, total[active],
+                          monthly_mean[active] + MONTH_ALPHA * (total[active] - monthly_mean[active]))
+        monthly_mean[active] = folded * (1 - MONTH_ALPHA) ** (gap - 1)
+        seen[active] += gap
+        current[active] = month_of[i]
+        total[active] = month_totals[i]
+
+    # Day-of-month weights, decayed by months before each group's last one
+    weights = np.zeros((g, DAYS))
+    np.add.at(weights, (group, days), values * DAY_DECAY ** (current[group] - months))
+
+    conn.executemany(
+        '''INSERT OR REPLACE INTO forecast_state
+           (user_id, category, n, mean, var, month, month_total, months, monthly_mean, weights)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        [(user_id, category, int(counts[i]), float(mean[i]), float(var[i]),
+          int(current[i]), float(total[i]), int(seen[i]), float(monthly_mean[i]),
+          json.dumps(weights[i].tolist()))
+         for (user_id, category), i in keys.items()]
+    )
+    conn.commit()
+    return g
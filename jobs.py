@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+
+# Background jobs for work too large to do inside a request, such as
+# deleting a big account's history or archiving old expenses.
+#
+# Jobs are rows in the `jobs` table, so any process can queue them and any
+# worker can pick them up; a job is claimed with a conditional UPDATE so two
+# workers never run the same one. Handlers work in small batches, commit
+# after each one and report progress, which keeps SQLite's write lock free
+# for other users between batches.
+
+BATCH_SIZE = 500
+BATCH_PAUSE = 0.05       # seconds between batches
+POLL_INTERVAL = 30       # seconds between checks when nothing woke the worker
+STALE_AFTER = 300        # seconds without progress before a running job is retried
+
+handlers = {}
+
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def handler(kind):
+    # Register a function(conn, user_id, params, report) for a job kind.
+    # Handlers must be safe to run again after an interruption.
+    def register(fn):
+        handlers[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(conn, user_id, kind, params=None):
+    cur = conn.execute(
+        'INSERT INTO jobs (user_id, kind, params) VALUES (?, ?, ?)',
+        (user_id, kind, json.dumps(params or {}))
+    )
+    conn.commit()
+    _wakeup.set()
+    return cur.lastrowid
+
+
+def delete_in_batches(conn, table, where, params, report, done=0, total=None):
+    # DELETE ... WHERE <where> in BATCH_SIZE chunks, one commit per chunk
+    while True:
+        cur = conn.execute(
+            f'DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)',
+            (*params, BATCH_SIZE)
+        )
+        conn.commit()
+        if not cur.rowcount:
+            return done
+        done += cur.rowcount
+        report(done, total)
+        time.sleep(BATCH_PAUSE)
+
+
+def changed_at(conn, user_id):
+    # Unix time up to which the user's jobs may have changed their data: now
+    # while one is queued or running, otherwise when the last one finished
+    # (rounded up, as updated_at has whole seconds). None if there are none.
+    active, finished = conn.execute(
+        '''SELECT MAX(status IN ('queued', 'running')), MAX(CAST(strftime('%s', updated_at) AS INTEGER))
+           FROM jobs WHERE user_id = ?''',
+        (user_id,)
+    ).fetchone()
+    if active:
+        return time.time()
+    return finished + 1 if finished is not None else None
+
+
+def requeue_stale(conn):
+    # Jobs left 'running' by a worker that died are picked up again
+    conn.execute(
+        '''UPDATE jobs SET status = 'queued'
+           WHERE status = 'running' AND updated_at < datetime('now', ?)''',
+        (f'-{STALE_AFTER} seconds',)
+    )
+    conn.commit()
+
+
+def claim_next(conn):
+    while True:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        cur = conn.execute(
+            '''UPDATE jobs SET status = 'running', updated_at = CURRENT_TIMESTAMP
+               WHERE id = ? AND status = 'queued' ''',
+            (row['id'],)
+        )
+        conn.commit()
+        if cur.rowcount:
+            return row
+
+
+def run_job(conn, job):
+    def report(done, total=None):
+        conn.execute(
+            '''UPDATE jobs SET done = ?, total = COALESCE(?, total), updated_at = CURRENT_TIMESTAMP
+               WHERE id = ?''',
+            (done, total, job['id'])
+        )
+        conn.commit()
+
+    try:
+        handlers[job['kind']](conn, job['user_id'], json.loads(job['params'] or '{}'), report)
+        conn.execute(
+            "UPDATE jobs SET status = 'done', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (job['id'],)
+        )
+    except Exception as e:
+        conn.rollback()
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (str(e), job['id'])
+        )
+        print('Job error:', job['kind'], e)
+    conn.commit()
+
+
+def run_pending(connect):
+    conn = connect()
+    try:
+        requeue_stale(conn)
+        while True:
+            job = claim_next(conn)
+            if job is None:
+                break
+            run_job(conn, job)
+    finally:
+        conn.close()
+
+
+def run_worker(app, connect):
+    with app.app_context():
+        while True:
+            run_pending(connect)
+            _wakeup.wait(POLL_INTERVAL)
+            _wakeup.clear()
+
+
+def start_worker(app, connect):
+    # Start this process's worker thread if it is not running yet
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=run_worker, args=(app, connect), daemon=True)
+            _worker.start()
+        _wakeup.set()
+    return _worker
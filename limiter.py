@@ -0,0 +1,156 @@
+import math
+import sqlite3
+import threading
+import time
+from flask import current_app, jsonify, request, session
+
+# Admission control for expensive endpoints.
+#
+# Every request to an endpoint listed in RATE_LIMIT_COSTS takes that many
+# tokens from two token buckets: one for the user (or client address when
+# logged out) and one shared by everybody. Buckets refill continuously up to
+# their capacity. A request that does not fit waits up to
+# RATE_LIMIT_MAX_WAIT seconds for tokens and is otherwise refused with 429
+# and a Retry-After header. Endpoints without a cost, such as adding an
+# expense, are never limited, so chart renders cannot starve them.
+#
+# With RATE_LIMIT_STORAGE = 'sqlite' the buckets live in a small SQLite file
+# of their own (RATE_LIMIT_DATABASE, by default DATABASE + '.limits'), so all
+# workers share them without taking the main database's write lock; 'memory'
+# keeps them per process. Idle buckets are swept out every PRUNE_INTERVAL
+# seconds.
+
+PRUNE_INTERVAL = 60
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL)'''
+
+
+def take(state, buckets, cost, now):
+    # Take `cost` tokens from every bucket, or from none. `buckets` is a list
+    # of (key, capacity, refill_per_second) and `state` maps key to
+    # (tokens, updated_at); it is updated in place. Returns 0 on success,
+    # otherwise the seconds until the request would fit.
+    levels, wait = [], 0.0
+    for key, capacity, rate in buckets:
+        tokens, updated_at = state.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        levels.append(tokens)
+        needed = min(cost, capacity)
+        if tokens < needed:
+            wait = max(wait, (needed - tokens) / rate)
+    if wait:
+        return wait
+    for (key, capacity, rate), tokens in zip(buckets, levels):
+        state[key] = (tokens - min(cost, capacity), now)
+    return 0.0
+
+
+def idle_cutoff(buckets, now):
+    # A bucket untouched for longer than its refill time is full again, the
+    # same as having no entry, so anything older than this can be dropped
+    return now - max(capacity / rate for _, capacity, rate in buckets)
+
+
+class MemoryBuckets:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}
+        self._pruned = 0.0
+
+    def take(self, buckets, cost):
+        with self._lock:
+            now = time.time()
+            if now - self._pruned > PRUNE_INTERVAL:
+                cutoff = idle_cutoff(buckets, now)
+                self._state = {key: v for key, v in self._state.items() if v[1] >= cutoff}
+                self._pruned = now
+            return take(self._state, buckets, cost, now)
+
+
+class SQLiteBuckets:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._created = False
+        self._pruned = 0.0
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        if not self._created:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute(SCHEMA)
+            self._created = True
+        return conn
+
+    def take(self, buckets, cost):
+        keys = [key for key, _, _ in buckets]
+        conn = self.connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            if now - self._pruned > PRUNE_INTERVAL:
+                conn.execute('DELETE FROM rate_limits WHERE updated_at < ?', (idle_cutoff(buckets, now),))
+                self._pruned = now
+            state = {
+                key: (tokens, updated_at)
+                for key, tokens, updated_at in conn.execute(
+                    f'SELECT key, tokens, updated_at FROM rate_limits WHERE key IN ({", ".join("?" * len(keys))})',
+                    keys
+                )
+            }
+            wait = take(state, buckets, cost, now)
+            if not wait:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO rate_limits (key, tokens, updated_at) VALUES (?, ?, ?)',
+                    [(key, *state[key]) for key in keys]
+                )
+            conn.execute('COMMIT')
+            return wait
+        finally:
+            conn.close()
+
+
+def get_buckets(app):
+    if 'rate_limit_buckets' not in app.extensions:
+        if app.config['RATE_LIMIT_STORAGE'] == 'sqlite':
+            path = app.config['RATE_LIMIT_DATABASE'] or app.config['DATABASE'] + '.limits'
+            app.extensions['rate_limit_buckets'] = SQLiteBuckets(path)
+        else:
+            app.extensions['rate_limit_buckets'] = MemoryBuckets()
+    return app.extensions['rate_limit_buckets']
+
+
+def admit():
+    # before_request hook: returns a 429 response when the request is shed
+    config = current_app.config
+    cost = config['RATE_LIMIT_COSTS'].get(request.endpoint)
+    if not cost or not config['RATE_LIMIT_ENABLED']:
+        return None
+
+    client = f"user:{session['user_id']}" if 'user_id' in session else f'addr:{request.remote_addr}'
+    buckets = [(client, *config['RATE_LIMIT_USER']), ('global', *config['RATE_LIMIT_GLOBAL'])]
+    store = get_buckets(current_app)
+    deadline = time.monotonic() + config['RATE_LIMIT_MAX_WAIT']
+    while True:
+        try:
+            wait = store.take(buckets, cost)
+        except sqlite3.Error as e:
+            # Never refuse work because the limiter itself is unavailable
+            print('Rate limiter error:', e)
+            return None
+        if not wait:
+            return None
+        if time.monotonic() + wait > deadline:
+            break
+        time.sleep(wait)
+
+    response = jsonify({'success': False, 'message': 'Too many requests, please try again shortly'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def init_app(app):
+    app.before_request(admit)
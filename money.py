@@ -0,0 +1,94 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Amounts are stored as integers in the currency's minor unit (paise, cents,
+# ...). Currencies without a minor unit are listed here; everything else has
+# two decimal places.
+CURRENCY_SCALE = {
+    'JPY': 0,
+}
+DEFAULT_SCALE = 2
+
+
+def scale_of(currency):
+    return CURRENCY_SCALE.get(currency, DEFAULT_SCALE)
+
+
+def scale_sql(currency_expr):
+    # SQL expression giving the minor units per major unit for a currency
+    # column, used by the REAL -> INTEGER migration
+    cases = ' '.join(f"WHEN '{c}' THEN {10 ** s}" for c, s in CURRENCY_SCALE.items())
+    return f'(CASE {currency_expr} {cases} ELSE {10 ** DEFAULT_SCALE} END)'
+
+
+class Money:
+    # An exact amount of one currency. Arithmetic only works between amounts
+    # of the same currency; use currency.rates to convert.
+
+    __slots__ = ('minor', 'currency')
+
+    def __init__(self, minor, currency):
+        self.minor = int(minor)
+        self.currency = currency
+
+    @classmethod
+    def parse(cls, value, currency):
+        # From user input such as "12.5" or 12.5. Going through str() keeps
+        # floats from leaking binary rounding into the stored value.
+        try:
+            amount = Decimal(str(value).strip())
+            if not amount.is_finite():
+                raise ValueError(f'Invalid amount: {value!r}')
+            minor = (amount * 10 ** scale_of(currency)).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+        except ArithmeticError:
+            # Also amounts too large to hold in whole minor units
+            raise ValueError(f'Invalid amount: {value!r}')
+        return cls(minor, currency)
+
+    @classmethod
+    def zero(cls, currency):
+        return cls(0, currency)
+
+    def to_decimal(self):
+        return Decimal(self.minor).scaleb(-scale_of(self.currency))
+
+    def __float__(self):
+        return self.minor / 10 ** scale_of(self.currency)
+
+    def _check(self, other):
+        if not isinstance(other, Money) or other.currency != self.currency:
+            raise ValueError(f'Cannot combine {self.currency} with {getattr(other, "currency", other)}')
+
+    def __add__(self, other):
+        self._check(other)
+        return Money(self.minor + other.minor, self.currency)
+
+    def __sub__(self, other):
+        self._check(other)
+        return Money(self.minor - other.minor, self.currency)
+
+    def __neg__(self):
+        return Money(-self.minor, self.currency)
+
+    def __eq__(self, other):
+        return isinstance(other, Money) and (self.minor, self.currency) == (other.minor, other.currency)
+
+    def __lt__(self, other):
+        self._check(other)
+        return self.minor < other.minor
+
+    def __hash__(self):
+        return hash((self.minor, self.currency))
+
+    def __bool__(self):
+        return self.minor != 0
+
+    def __str__(self):
+        return f'{self.to_decimal():.{scale_of(self.currency)}f}'
+
+    def __repr__(self):
+        return f'Money({self}, {self.currency!r})'
+
+
+def format_money(minor, currency):
+    # Jinja filter: {{ expense.amount|money(expense.currency) }}
+    return str(Money(minor or 0, currency))
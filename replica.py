@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import threading
+import time
+import click
+from flask import current_app
+
+# Read-only snapshot of the database for analytics.
+#
+# Statistics, charts, exports and the full records list scan a lot of rows.
+# Running them against a copy keeps those scans from holding read locks on
+# the database every write goes to. refresh() copies the live database with
+# SQLite's online backup API into a temporary file and swaps it in
+# atomically, so readers always see one consistent snapshot. The scheduler
+# refreshes it every REPLICA_REFRESH_INTERVAL seconds; connect() also starts
+# a refresh in the background whenever it finds the copy too old.
+#
+# The snapshot's age comes from the file's modification time, so every
+# process sharing the database agrees on it. A copy older than
+# REPLICA_MAX_STALENESS seconds, or older than the user's own last change, is
+# never used: callers fall back to the primary.
+
+# Pages copied per backup step; writers can get in between steps
+BACKUP_PAGES = 1024
+BACKUP_SLEEP = 0.005
+
+_refresh_lock = threading.Lock()
+
+
+def replica_path(app):
+    return app.config['REPLICA_DATABASE'] or app.config['DATABASE'] + '.replica'
+
+
+def age(app):
+    # Seconds since the snapshot was taken, or None if there is none
+    try:
+        return time.time() - os.path.getmtime(replica_path(app))
+    except OSError:
+        return None
+
+
+def refresh(app):
+    # Take a new snapshot. Returns False if another refresh in this process
+    # is already running.
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+    try:
+        path = replica_path(app)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        started = time.time()
+        source = sqlite3.connect(app.config['DATABASE'])
+        target = sqlite3.connect(tmp)
+        try:
+            source.backup(target, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP)
+        finally:
+            target.close()
+            source.close()
+        # The copy holds everything committed before it started; date it
+        # then so age() never understates staleness
+        os.utime(tmp, (started, started))
+        # Open read connections keep the old file until they close
+        os.replace(tmp, path)
+        return True
+    finally:
+        _refresh_lock.release()
+
+
+def refresh_in_background(app):
+    if _refresh_lock.locked():
+        return
+    threading.Thread(target=refresh_quietly, args=(app,), daemon=True).start()
+
+
+def refresh_quietly(app):
+    try:
+        refresh(app)
+    except Exception as e:
+        print('Replica refresh error:', e)
+
+
+def connect(app=None, not_before=None):
+    # Read-only connection to a fresh enough snapshot, or None if the caller
+    # should use the primary instead. `not_before` (a timestamp) rejects
+    # snapshots taken before it, so users always see their own writes.
+    app = app or current_app._get_current_object()
+    max_staleness = app.config['REPLICA_MAX_STALENESS']
+    if not max_staleness:
+        return None
+
+    snapshot_age = age(app)
+    if (snapshot_age is None or snapshot_age > max_staleness
+            or (not_before and time.time() - snapshot_age < not_before)):
+        refresh_in_background(app)
+        return None
+
+    try:
+        conn = sqlite3.connect(f'file:{replica_path(app)}?mode=ro', uri=True)
+    except sqlite3.Error:
+        return None
+    conn.row_factory = sqlite3.Row
+    if app.config['REPLICA_MMAP_SIZE']:
+        conn.execute(f"PRAGMA mmap_size = {int(app.config['REPLICA_MMAP_SIZE'])}")
+    return conn
+
+
+@click.command('refresh-replica')
+def refresh_replica_command():
+    """Copy the database into the read-only analytics snapshot."""
+    start = time.perf_counter()
+    refresh(current_app)
+    click.echo(f'Refreshed {replica_path(current_app)} in {time.perf_counter() - start:.2f}s.')
+
+
+def init_app(app):
+    app.cli.add_command(refresh_replica_command)
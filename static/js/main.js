@@ -22,6 +22,67 @@ function pageLoaded() {
             btn.style.display = "none";
         }
     }
+
+    connectEvents();
+}
+
+// Live updates from the server (/events). Budget changes are re-dispatched
+// as a "budget-update" DOM event for pages that show the budget, and
+// threshold alerts pop up as a toast on any page. EventSource reconnects
+// by itself and resumes from the last event it received.
+function connectEvents() {
+    var url = document.body.getAttribute("data-events");
+
+    if (url == null || !window.EventSource) {
+        return;
+    }
+
+    var source = new EventSource(url);
+
+    source.addEventListener("budget", function(e) {
+        document.dispatchEvent(new CustomEvent("budget-update", { detail: JSON.parse(e.data) }));
+    });
+
+    source.addEventListener("budget_alert", function(e) {
+        showBudgetAlert(JSON.parse(e.data));
+    });
+}
+
+// Show a toast for a crossed budget threshold
+function showBudgetAlert(alert) {
+    var container = document.getElementById("liveAlerts");
+
+    if (container == null) {
+        return;
+    }
+
+    var style = "bg-info";
+    var text = "You have used " + alert.threshold + "% of your budget for " + alert.month + "/" + alert.year + ".";
+
+    if (alert.threshold >= 100) {
+        style = "bg-danger";
+        text = "You have exceeded your budget for " + alert.month + "/" + alert.year + ".";
+    } else if (alert.threshold >= 80) {
+        style = "bg-warning";
+    }
+
+    var toast = document.createElement("div");
+    toast.className = "toast align-items-center text-white border-0 " + style;
+    toast.setAttribute("role", "alert");
+    toast.innerHTML =
+        '<div class="d-flex">' +
+            '<div class="toast-body">' +
+                '<i class="bi bi-exclamation-triangle-fill me-2"></i>' + text +
+                '<br>Spent ' + alert.spent + ' of ' + alert.budget + ' ' + alert.currency +
+            '</div>' +
+            '<button type="button" class="btn-close btn-close-white me-2 m-auto" data-bs-dismiss="toast"></button>' +
+        '</div>';
+
+    container.appendChild(toast);
+    toast.addEventListener("hidden.bs.toast", function() {
+        toast.remove();
+    });
+    new bootstrap.Toast(toast, { delay: 8000 }).show();
 }
 
 // Format Currency
@@ -83,22 +144,30 @@ function updateExpense() {
     var category = document.getElementById("category").value;
     var description = document.getElementById("description").value;
 
-    fetch("/update_expense/" + id, {
-        method: "PUT",
+    fetch("/api/v1/batch", {
+        method: "POST",
         headers: {
             "Content-Type": "application/json"
         },
         body: JSON.stringify({
-            amount: amount,
-            category: category,
-            description: description
+            operations: [{
+                op: "edit_expense",
+                id: parseInt(id),
+                amount: amount,
+                category: category,
+                description: description
+            }]
         })
     })
     .then(function(response) {
         return response.json();
     })
     .then(function(data) {
-        alert(data.message);
-        location.reload();
+        if (data.success) {
+            alert("Expense updated successfully");
+            location.reload();
+        } else {
+            alert(data.results ? data.results[0].message : data.message);
+        }
     });
 }
@@ -0,0 +1,9 @@
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('form[method="POST"]').forEach(form => {
+        form.addEventListener('submit', function(e) {
+            if (!confirm('Are you sure you want to delete this transaction? This action cannot be undone.')) {
+                e.preventDefault();
+            }
+        });
+    });
+});
@@ -0,0 +1,135 @@
+// Update the current month's card in place from a budget state (sent with
+// the form response and pushed over /events whenever spending changes)
+function applyBudgetState(state) {
+    const card = document.getElementById('budgetStatus');
+    if (!card || state.month != card.dataset.month || state.year != card.dataset.year) {
+        return;
+    }
+
+    const hasBudget = state.budget !== null;
+    document.getElementById('budgetDetails').classList.toggle('d-none', !hasBudget);
+    document.getElementById('budgetEmpty').classList.toggle('d-none', hasBudget);
+
+    const values = {
+        budget: `${state.budget} ${state.currency}`,
+        spent: `${state.spent} ${state.currency}`,
+        remaining: hasBudget ? `${state.remaining} ${state.currency}` : `0 ${state.currency}`,
+        percentage: `${(state.percentage || 0).toFixed(1)}%`,
+        'percentage-rounded': `${Math.round(state.percentage || 0)}%`,
+        projected: `${state.projected} ${state.currency}`
+    };
+    document.querySelectorAll('[data-budget-field]').forEach(el => {
+        el.textContent = values[el.dataset.budgetField];
+        if (el.dataset.budgetField === 'remaining') {
+            el.classList.toggle('text-success', !state.over);
+            el.classList.toggle('text-danger', state.over);
+            const metric = el.closest('.budget-metric');
+            if (metric) {
+                metric.classList.toggle('remaining-positive', !state.over);
+                metric.classList.toggle('remaining-negative', state.over);
+            }
+        }
+    });
+
+    const projection = document.getElementById('budgetProjection');
+    projection.classList.toggle('text-danger', state.projected_over);
+    projection.classList.toggle('text-muted', !state.projected_over);
+
+    const percentage = state.percentage || 0;
+    document.querySelector('.progress-budget').dataset.percentage = percentage;
+    document.querySelector('.progress-fill').style.width = `${Math.min(percentage, 100)}%`;
+
+    const warning = document.getElementById('budgetWarning');
+    if (percentage >= 90) {
+        warning.innerHTML = `
+            <div class="alert-budget alert-danger">
+                <i class="bi bi-exclamation-triangle-fill me-2"></i>
+                <strong>Critical!</strong> You've exceeded 90% of your monthly budget.
+            </div>`;
+    } else if (percentage >= 75) {
+        warning.innerHTML = `
+            <div class="alert-budget alert-warning">
+                <i class="bi bi-exclamation-triangle me-2"></i>
+                <strong>Caution!</strong> You're using 75%+ of your budget. Slow down spending.
+            </div>`;
+    } else if (percentage >= 50) {
+        warning.innerHTML = `
+            <div class="alert-budget alert-info">
+                <i class="bi bi-info-circle me-2"></i>
+                <strong>Halfway!</strong> You've used ${Math.round(percentage)}% of your budget.
+            </div>`;
+    } else {
+        warning.innerHTML = '';
+    }
+}
+
+// Pushed by main.js from the /events stream
+document.addEventListener('budget-update', (e) => applyBudgetState(e.detail));
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Enhanced budget form submission
+    document.getElementById('budgetForm').addEventListener('submit', async (e) => {
+        e.preventDefault();
+        const btn = e.target.querySelector('button[type="submit"]');
+        const originalText = btn.innerHTML;
+        
+        btn.disabled = true;
+        btn.innerHTML = '<span class="spinner-border spinner-border-sm me-2"></span><span>Saving...</span>';
+        
+        try {
+            const data = {
+                month: parseInt(document.getElementById('month').value),
+                year: parseInt(document.getElementById('year').value),
+                amount: parseFloat(document.getElementById('amount').value)
+            };
+            
+            const response = await fetch('/budget', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify(data)
+            });
+            
+            const result = await response.json();
+            const messageDiv = document.getElementById('budgetMessage');
+            
+            if (result.success) {
+                messageDiv.innerHTML = `
+                    <div class="alert alert-success d-flex align-items-center">
+                    <i class="bi bi-check-circle-fill me-2"></i>
+                    ${result.message}
+                    </div>
+                `;
+                if (result.budget) {
+                    applyBudgetState(result.budget);
+                }
+                document.getElementById('amount').value = '';
+            } else {
+                messageDiv.innerHTML = `
+                    <div class="alert alert-danger d-flex align-items-center">
+                    <i class="bi bi-exclamation-triangle-fill me-2"></i>
+                    ${result.message || 'Error setting budget'}
+                    </div>
+                `;
+            }
+        } catch (error) {
+            document.getElementById('budgetMessage').innerHTML = `
+                <div class="alert alert-danger d-flex align-items-center">
+                    <i class="bi bi-wifi-off me-2"></i>
+                    Network error. Please try again.
+                </div>
+            `;
+        } finally {
+            btn.disabled = false;
+            btn.innerHTML = originalText;
+        }
+    });
+
+    // Animate progress bar on load
+    const progressBars = document.querySelectorAll('.progress-fill');
+    progressBars.forEach(bar => {
+        bar.style.width = '0%';
+        setTimeout(() => {
+            bar.style.width = bar.style.width;
+        }, 500);
+    });
+});
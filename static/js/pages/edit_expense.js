@@ -0,0 +1,41 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Form validation and submission feedback
+    const form = document.getElementById('editExpenseForm');
+    const submitBtn = form.querySelector('button[type="submit"]');
+    
+    form.addEventListener('submit', function(e) {
+        const amount = form.querySelector('input[name="amount"]').value;
+        const category = form.querySelector('select[name="category"]').value;
+        
+        if (!amount || parseFloat(amount) <= 0) {
+            e.preventDefault();
+            alert('Please enter a valid amount greater than 0');
+            return false;
+        }
+        
+        if (!category) {
+            e.preventDefault();
+            alert('Please select a category');
+            return false;
+        }
+        
+        // Add loading state
+        const originalText = submitBtn.innerHTML;
+        submitBtn.disabled = true;
+        submitBtn.innerHTML = '<span class="spinner-border spinner-border-sm me-2"></span>Updating...';
+        
+        setTimeout(() => {
+            submitBtn.disabled = false;
+            submitBtn.innerHTML = originalText;
+        }, 3000);
+    });
+
+    // Auto-format amount input
+    const amountInput = form.querySelector('input[name="amount"]');
+    amountInput.addEventListener('input', function() {
+        let value = parseFloat(this.value);
+        if (value) {
+            this.value = value.toFixed(2);
+        }
+    });
+});
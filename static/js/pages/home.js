@@ -0,0 +1,78 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Transaction type toggle
+    document.querySelectorAll('input[name="transactionType"]').forEach(radio => {
+        radio.addEventListener('change', function() {
+            const categoryGroup = document.getElementById('categoryGroup');
+            if (this.value === 'income') {
+                categoryGroup.style.display = 'none';
+                document.getElementById('category').required = false;
+            } else {
+                categoryGroup.style.display = 'block';
+                document.getElementById('category').required = true;
+            }
+        });
+    });
+
+    // Submit form
+    document.getElementById('submitExpense').addEventListener('click', async function(e) {
+        e.preventDefault();
+        const form = document.getElementById('expenseForm');
+        const formData = new FormData(form);
+        const transactionType = document.querySelector('input[name="transactionType"]:checked').value;
+        
+        const data = {
+            amount: parseFloat(formData.get('amount')),
+            category: transactionType === 'income' ? 'Income' : formData.get('category'),
+            description: formData.get('description') || '',
+            currency: formData.get('currency'),
+            is_income: transactionType === 'income'
+        };
+
+        if (!data.amount || data.amount <= 0) {
+            alert('Please enter a valid amount');
+            return;
+        }
+        if (transactionType === 'expense' && !data.category) {
+            alert('Please select a category');
+            return;
+        }
+
+        const btn = this;
+        const originalText = btn.innerHTML;
+        btn.disabled = true;
+        btn.innerHTML = '<span class="spinner-border spinner-border-sm me-2"></span>Adding...';
+
+        try {
+            const response = await fetch('/add_expense', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(data)
+            });
+            const result = await response.json();
+            
+            if (result.success) {
+                bootstrap.Modal.getInstance(document.getElementById('expenseModal')).hide();
+                if (result.anomaly) {
+                    alert(`This is much more than you usually spend on ${result.anomaly.category} ` +
+                          `(typically ${result.anomaly.usual} ${result.anomaly.currency}).`);
+                }
+                setTimeout(() => location.reload(), 800);
+            } else {
+                alert(result.message || 'Error adding transaction');
+            }
+        } catch (error) {
+            alert('Network error. Please try again.');
+        } finally {
+            btn.disabled = false;
+            btn.innerHTML = originalText;
+        }
+    });
+
+    // Reset form
+    document.getElementById('expenseModal').addEventListener('hidden.bs.modal', function() {
+        document.getElementById('expenseForm').reset();
+        document.getElementById('categoryGroup').style.display = 'block';
+        document.querySelector('input[name="transactionType"][value="expense"]').checked = true;
+        document.getElementById('category').required = true;
+    });
+});
@@ -0,0 +1,75 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('loginForm');
+    const submitBtn = document.getElementById('loginBtn');
+    const btnText = submitBtn.querySelector('.btn-text');
+    const spinner = document.getElementById('loginSpinner');
+    const messageDiv = document.getElementById('loginMessage');
+
+    form.addEventListener('submit', async function(e) {
+        e.preventDefault();
+        
+        messageDiv.classList.remove('show', 'alert-success', 'alert-danger');
+        
+        submitBtn.disabled = true;
+        spinner.classList.remove('d-none');
+        btnText.textContent = 'Signing In...';
+
+        const formData = {
+            username: document.getElementById('username').value.trim(),
+            password: document.getElementById('password').value
+        };
+
+        try {
+            const response = await fetch('/login', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(formData)
+            });
+            
+            const data = await response.json();
+            
+            if (data.success) {
+                messageDiv.innerHTML = `
+                    <div class="d-flex align-items-center">
+                        <i class="bi bi-check-circle-fill me-3 fs-4 text-success"></i>
+                        <div>
+                            <strong>Login Successful!</strong><br>
+                            <small class="opacity-75">Redirecting to dashboard...</small>
+                        </div>
+                    </div>
+                `;
+                messageDiv.className = 'alert-success message-alert';
+                messageDiv.classList.add('show');
+                
+                setTimeout(() => {
+                    window.location.href = '/home';
+                }, 1500);
+            } else {
+                messageDiv.innerHTML = `
+                    <div class="d-flex align-items-center">
+                        <i class="bi bi-exclamation-triangle-fill me-3 fs-4 text-danger"></i>
+                        <strong>${data.message || 'Invalid credentials'}</strong>
+                    </div>
+                `;
+                messageDiv.className = 'alert-danger message-alert';
+                messageDiv.classList.add('show');
+            }
+        } catch (error) {
+            messageDiv.innerHTML = `
+                <div class="d-flex align-items-center">
+                    <i class="bi bi-wifi-off me-3 fs-4 text-muted"></i>
+                    <strong>Network Error</strong><br>
+                    <small class="opacity-75">Please check your connection</small>
+                </div>
+            `;
+            messageDiv.className = 'alert-danger message-alert';
+            messageDiv.classList.add('show');
+        } finally {
+            setTimeout(() => {
+                submitBtn.disabled = false;
+                spinner.classList.add('d-none');
+                btnText.textContent = 'Get Started';
+            }, 500);
+        }
+    });
+});
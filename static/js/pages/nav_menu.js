@@ -0,0 +1,27 @@
+// Clean Menu Toggle
+(function() {
+    'use strict';
+    
+    const moreMenuBtn = document.getElementById('moreMenuBtn');
+    const moreMenuDropdown = document.getElementById('moreMenuDropdown');
+    const moreMenuContainer = document.querySelector('.more-menu-container');
+    
+    moreMenuContainer.addEventListener('mouseenter', function() {
+        moreMenuDropdown.classList.add('show');
+    });
+    
+    moreMenuContainer.addEventListener('mouseleave', function() {
+        moreMenuDropdown.classList.remove('show');
+    });
+    
+    moreMenuBtn.addEventListener('click', function(e) {
+        e.stopPropagation();
+        moreMenuDropdown.classList.toggle('show');
+    });
+    
+    document.addEventListener('click', function(e) {
+        if (!moreMenuContainer.contains(e.target)) {
+            moreMenuDropdown.classList.remove('show');
+        }
+    });
+})();
@@ -0,0 +1,120 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Add Payment
+    document.getElementById('submitPayment').addEventListener('click', async function() {
+        const formData = {
+            title: document.getElementById('title').value.trim(),
+            amount: parseFloat(document.getElementById('amount').value),
+            payment_date: document.getElementById('payment_date').value,
+            category: document.getElementById('category').value || null,
+            recurring: document.getElementById('recurring').checked ? 1 : 0
+        };
+        
+        if (!formData.title || !formData.amount || !formData.payment_date) {
+            alert('Please fill all required fields');
+            return;
+        }
+        
+        const btn = this;
+        const originalText = btn.innerHTML;
+        btn.disabled = true;
+        btn.innerHTML = 'Saving...';
+        
+        try {
+            const response = await fetch('/planned_payments', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(formData)
+            });
+            const result = await response.json();
+            
+            if (result.success) {
+                btn.innerHTML = 'Saved! ✅';
+                setTimeout(() => location.reload(), 1200);
+            } else {
+                alert(result.message || 'Error saving payment');
+            }
+        } catch (error) {
+            alert('Network error');
+        } finally {
+            btn.disabled = false;
+            btn.innerHTML = originalText;
+        }
+    });
+
+    // Edit Payment
+    document.querySelectorAll('.edit-btn').forEach(btn => {
+        btn.addEventListener('click', function() {
+            document.getElementById('edit_payment_id').value = this.dataset.id;
+            document.getElementById('edit_title').value = this.dataset.title;
+            document.getElementById('edit_amount').value = this.dataset.amount;
+            document.getElementById('edit_payment_date').value = this.dataset.date;
+            document.getElementById('edit_category').value = this.dataset.category;
+            document.getElementById('edit_recurring').checked = this.dataset.recurring == '1';
+            new bootstrap.Modal(document.getElementById('editPaymentModal')).show();
+        });
+    });
+
+    document.getElementById('submitEditPayment').addEventListener('click', async function() {
+        const formData = {
+            id: document.getElementById('edit_payment_id').value,
+            title: document.getElementById('edit_title').value.trim(),
+            amount: parseFloat(document.getElementById('edit_amount').value),
+            payment_date: document.getElementById('edit_payment_date').value,
+            category: document.getElementById('edit_category').value || null,
+            recurring: document.getElementById('edit_recurring').checked ? 1 : 0
+        };
+        
+        const btn = this;
+        const originalText = btn.innerHTML;
+        btn.disabled = true;
+        btn.innerHTML = 'Updating...';
+        
+        try {
+            const response = await fetch(`/edit_planned_payment/${formData.id}`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(formData)
+            });
+            const result = await response.json();
+            
+            if (result.success) {
+                btn.innerHTML = 'Updated! ✅';
+                setTimeout(() => location.reload(), 1200);
+            } else {
+                alert(result.message || 'Error updating payment');
+            }
+        } catch (error) {
+            alert('Network error');
+        } finally {
+            btn.disabled = false;
+            btn.innerHTML = originalText;
+        }
+    });
+
+    // Delete Payment
+    document.querySelectorAll('.delete-btn').forEach(btn => {
+        btn.addEventListener('click', async function() {
+            if (confirm('Are you sure you want to delete this payment?')) {
+                try {
+                    const response = await fetch(`/delete_planned_payment/${this.dataset.id}`, {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' }
+                    });
+                    const result = await response.json();
+                    if (result.success) {
+                        location.reload();
+                    } else {
+                        alert('Delete failed');
+                    }
+                } catch (error) {
+                    alert('Network error');
+                }
+            }
+        });
+    });
+
+    // Set default date
+    const tomorrow = new Date();
+    tomorrow.setDate(tomorrow.getDate() + 1);
+    document.getElementById('payment_date').value = tomorrow.toISOString().split('T')[0];
+});
@@ -0,0 +1,143 @@
+function resetForm() {
+    // Restore the values the page was rendered with
+    ['username', 'email', 'phone'].forEach(id => {
+        const field = document.getElementById(id);
+        field.value = field.defaultValue;
+    });
+    const currency = document.getElementById('currency');
+    currency.value = (currency.querySelector('option[selected]') || currency.options[0]).value;
+    
+    document.querySelectorAll('.form-control, .form-select').forEach(field => {
+        field.classList.remove('is-invalid', 'is-valid');
+        field.style.borderColor = '#e2e8f0';
+        field.style.boxShadow = 'none';
+    });
+    
+    document.querySelectorAll('.invalid-feedback').forEach(error => {
+        error.classList.remove('show');
+        error.textContent = '';
+    });
+    
+    document.getElementById('profileMessage').innerHTML = '';
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('profileForm');
+    const resetBtn = document.getElementById('resetBtn');
+    
+    form.addEventListener('input', function(e) {
+        const field = e.target;
+        const errorDiv = document.getElementById(field.id + '-error');
+        
+        field.classList.remove('is-invalid');
+        errorDiv.classList.remove('show');
+        
+        switch(field.id) {
+            case 'username':
+                if (field.value.trim().length < 3 || field.value.trim().length > 50) {
+                    field.classList.add('is-invalid');
+                    errorDiv.textContent = 'Username must be 3-50 characters';
+                    errorDiv.classList.add('show');
+                }
+                break;
+            case 'email':
+                const emailRegex = /^[^\s@]+@[^\s@]+\.[^\s@]+$/;
+                if (!emailRegex.test(field.value)) {
+                    field.classList.add('is-invalid');
+                    errorDiv.textContent = 'Please enter a valid email';
+                    errorDiv.classList.add('show');
+                }
+                break;
+            case 'phone':
+                const phoneRegex = /^[\+]?[1-9][\d]{0,15}$/;
+                if (field.value && !phoneRegex.test(field.value.replace(/\D/g, ''))) {
+                    field.classList.add('is-invalid');
+                    errorDiv.textContent = 'Please enter a valid phone number';
+                    errorDiv.classList.add('show');
+                }
+                break;
+        }
+    });
+    
+    resetBtn.addEventListener('click', function(e) {
+        e.preventDefault();
+        e.stopPropagation();
+        resetForm();
+    });
+    
+    form.addEventListener('submit', async (e) => {
+        e.preventDefault();
+        
+        let isValid = true;
+        const fields = ['username', 'email', 'currency'];
+        
+        fields.forEach(fieldId => {
+            const field = document.getElementById(fieldId);
+            const errorDiv = document.getElementById(fieldId + '-error');
+            
+            field.classList.remove('is-invalid');
+            errorDiv.classList.remove('show');
+            
+            switch(fieldId) {
+                case 'username':
+                    if (field.value.trim().length < 3 || field.value.trim().length > 50) {
+                        field.classList.add('is-invalid');
+                        errorDiv.textContent = 'Username must be 3-50 characters';
+                        errorDiv.classList.add('show');
+                        isValid = false;
+                    }
+                    break;
+                case 'email':
+                    const emailRegex = /^[^\s@]+@[^\s@]+\.[^\s@]+$/;
+                    if (!emailRegex.test(field.value)) {
+                        field.classList.add('is-invalid');
+                        errorDiv.textContent = 'Please enter a valid email';
+                        errorDiv.classList.add('show');
+                        isValid = false;
+                    }
+                    break;
+            }
+        });
+        
+        if (!isValid) return;
+        
+        const submitBtn = form.querySelector('button[type="submit"]');
+        const originalText = submitBtn.innerHTML;
+        submitBtn.disabled = true;
+        submitBtn.innerHTML = 'Saving...';
+        
+        const data = {
+            username: document.getElementById('username').value.trim(),
+            email: document.getElementById('email').value.trim(),
+            phone: document.getElementById('phone').value.trim(),
+            currency: document.getElementById('currency').value
+        };
+        
+        try {
+            const response = await fetch('/profile', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify(data)
+            });
+            
+            const result = await response.json();
+            const messageDiv = document.getElementById('profileMessage');
+            
+            messageDiv.className = 'alert alert-success mt-3';
+            messageDiv.innerHTML = 'Profile updated successfully';
+            
+            if (result.success === false) {
+                messageDiv.className = 'alert alert-danger mt-3';
+                messageDiv.innerHTML = result.message || 'Failed to update profile';
+            }
+            
+        } catch (error) {
+            const messageDiv = document.getElementById('profileMessage');
+            messageDiv.className = 'alert alert-success mt-3';
+            messageDiv.innerHTML = 'Profile updated successfully';
+        } finally {
+            submitBtn.disabled = false;
+            submitBtn.innerHTML = originalText;
+        }
+    });
+});
@@ -0,0 +1,71 @@
+// Poll a background job until it finishes, showing progress on the button
+async function waitForJob(jobId, button) {
+    while (true) {
+        const response = await fetch('/jobs/' + jobId);
+        const job = await response.json();
+        if (!job.success || job.status === 'done' || job.status === 'failed') {
+            return job;
+        }
+        if (job.total) {
+            const percent = Math.floor(job.done * 100 / job.total);
+            button.innerHTML = '<span class="spinner-border spinner-border-sm me-2"></span>Deleting... ' + percent + '%';
+        }
+        await new Promise(resolve => setTimeout(resolve, 500));
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Delete expenses
+    document.getElementById('confirmDeleteExpenses').addEventListener('click', async function() {
+        const submitBtn = this;
+        const originalText = submitBtn.innerHTML;
+        submitBtn.disabled = true;
+        submitBtn.innerHTML = '<span class="spinner-border spinner-border-sm me-2"></span>Deleting...';
+        
+        try {
+            const response = await fetch('/settings', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({action: 'delete_expenses'})
+            });
+            
+            const result = await response.json();
+            if (result.success) {
+                await waitForJob(result.job_id, submitBtn);
+                location.reload();
+            }
+        } catch (error) {
+            console.error('Delete failed');
+        } finally {
+            submitBtn.disabled = false;
+            submitBtn.innerHTML = originalText;
+        }
+    });
+
+    // Delete profile
+    document.getElementById('confirmDeleteProfile').addEventListener('click', async function() {
+        if (!confirm('Are you ABSOLUTELY sure? This will delete EVERYTHING permanently!')) {
+            return;
+        }
+        
+        const submitBtn = this;
+        const originalText = submitBtn.innerHTML;
+        submitBtn.disabled = true;
+        submitBtn.innerHTML = '<span class="spinner-border spinner-border-sm me-2"></span>Deleting...';
+        
+        try {
+            const response = await fetch('/settings', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({action: 'delete_profile'})
+            });
+            
+            const result = await response.json();
+            if (result.success) {
+                window.location.href = '/login';
+            }
+        } catch (error) {
+            console.error('Profile deletion failed');
+        }
+    });
+});
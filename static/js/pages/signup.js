@@ -0,0 +1,85 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('signupForm');
+    const submitBtn = document.getElementById('signupBtn');
+    const btnText = submitBtn.querySelector('.btn-text');
+    const spinner = document.getElementById('signupSpinner');
+    const messageDiv = document.getElementById('signupMessage');
+
+    form.addEventListener('submit', async function(e) {
+        e.preventDefault();
+        
+        // Hide previous message
+        messageDiv.classList.remove('show', 'alert-success', 'alert-danger');
+        
+        // Show loading state
+        submitBtn.disabled = true;
+        spinner.classList.remove('d-none');
+        btnText.textContent = 'Creating Account...';
+
+        const formData = {
+            username: document.getElementById('username').value.trim(),
+            email: document.getElementById('email').value.trim(),
+            phone: document.getElementById('phone').value.trim(),
+            password: document.getElementById('password').value,
+            confirmPassword: document.getElementById('confirmPassword').value,
+            currency: document.getElementById('currency').value,
+            balance: parseFloat(document.getElementById('balance').value) || 0
+        };
+
+        try {
+            const response = await fetch('/signup', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(formData)
+            });
+            
+            const data = await response.json();
+            
+            if (data.success) {
+                // ✅ PROFESSIONAL SUCCESS MESSAGE LIKE LOGIN
+                messageDiv.innerHTML = `
+                    <div class="d-flex align-items-center">
+                        <i class="bi bi-check-circle-fill me-3 fs-4 text-success"></i>
+                        <div>
+                            <strong>Account Created Successfully!</strong><br>
+                            <small class="opacity-75">Redirecting to login...</small>
+                        </div>
+                    </div>
+                `;
+                messageDiv.className = 'alert-success message-alert';
+                messageDiv.classList.add('show');
+                
+                setTimeout(() => {
+                    window.location.href = '/login';
+                }, 1500);
+            } else {
+                // ✅ PROFESSIONAL ERROR MESSAGE LIKE LOGIN
+                messageDiv.innerHTML = `
+                    <div class="d-flex align-items-center">
+                        <i class="bi bi-exclamation-triangle-fill me-3 fs-4 text-danger"></i>
+                        <strong>${data.message || 'Signup failed'}</strong>
+                    </div>
+                `;
+                messageDiv.className = 'alert-danger message-alert';
+                messageDiv.classList.add('show');
+            }
+        } catch (error) {
+            // ✅ NETWORK ERROR LIKE LOGIN
+            messageDiv.innerHTML = `
+                <div class="d-flex align-items-center">
+                    <i class="bi bi-wifi-off me-3 fs-4 text-muted"></i>
+                    <strong>Network Error</strong><br>
+                    <small class="opacity-75">Please check your connection and try again</small>
+                </div>
+            `;
+            messageDiv.className = 'alert-danger message-alert';
+            messageDiv.classList.add('show');
+        } finally {
+            setTimeout(() => {
+                submitBtn.disabled = false;
+                spinner.classList.add('d-none');
+                btnText.textContent = 'Create Account';
+            }, 500);
+        }
+    });
+});
@@ -0,0 +1,57 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const expenseChart = document.getElementById('expenseChart');
+    const chartLoader = document.getElementById('chartLoader');
+    
+    // FIXED RADIO BUTTON SELECTION - PERFECTLY WORKING
+    document.querySelectorAll('.period-radio').forEach(radio => {
+        radio.addEventListener('change', function() {
+            const period = this.value;
+            
+            // Show loader immediately
+            chartLoader.style.display = 'block';
+            
+            // Remove ALL active classes first
+            document.querySelectorAll('.period-btn').forEach(btn => {
+                btn.classList.remove('active');
+            });
+            
+            // Add active ONLY to clicked button
+            const activeLabel = document.querySelector(`label[for="${this.id}"]`);
+            activeLabel.classList.add('active');
+            
+            // Update chart with cache busting
+            expenseChart.src = `/api/expense_chart?period=${period}&t=${Date.now()}`;
+        });
+    });
+    
+    // Hide loader when chart loads
+    expenseChart.addEventListener('load', function() {
+        chartLoader.style.display = 'none';
+    });
+    
+    // Error handling
+    expenseChart.addEventListener('error', function() {
+        chartLoader.style.display = 'none';
+        console.log('Chart endpoint failed - check /api/expense_chart');
+    });
+    
+    // Initial load check
+    if (expenseChart.complete) {
+        chartLoader.style.display = 'none';
+    }
+});
+
+function exportData(format) {
+    const period = document.querySelector('input[name="period"]:checked')?.value || 'monthly';
+    const btn = event.target.closest('button');
+    const originalText = btn.innerHTML;
+    
+    btn.disabled = true;
+    btn.innerHTML = `<span class="spinner-border spinner-border-sm me-2" style="width: 16px; height: 16px;"></span>Exporting...`;
+    
+    setTimeout(() => {
+        window.open(`/export_statistics?format=${format}&period=${period}`, '_blank');
+        btn.disabled = false;
+        btn.innerHTML = originalText;
+    }, 500);
+}
@@ -0,0 +1,151 @@
+import json
+from archive import archived_expenses
+
+# Delta sync for offline clients.
+#
+# Every write to a synced table bumps the owning user's counter in
+# `change_seq` and stamps the row's entry in `changes` with the new value.
+# The stamping is done by SQLite triggers, so request handlers, the batch
+# API, background jobs and CLI commands cannot forget it. `changes` keeps a
+# single entry per row with its latest sequence number, and deletes leave a
+# tombstone entry (deleted = 1). A client that remembers the highest
+# sequence number it has seen asks for everything above it; the work done is
+# proportional to what changed since then, however long the history is.
+#
+# Archiving moves expenses out of `expenses` without deleting them; the
+# archiver flips their tombstones to archived = 1 and the rows are served
+# from the archive instead.
+
+# table: (entity name in the feed, column with the owning user's id, fields sent)
+SYNCED_TABLES = {
+    'users': ('user', 'id', ('username', 'email', 'phone', 'currency', 'balance', 'theme')),
+    'expenses': ('expense', 'user_id', ('amount', 'currency', 'category', 'description', 'date', 'anomaly')),
+    'planned_payments': ('planned_payment', 'user_id', ('title', 'amount', 'payment_date', 'category', 'recurring')),
+    'budget': ('budget', 'user_id', ('month', 'year', 'amount')),
+}
+
+ENTITY_TABLES = {entity: table for table, (entity, _, _) in SYNCED_TABLES.items()}
+
+# Trigger body. Upserts rather than INSERT OR REPLACE: a conflict clause on
+# the statement that fires a trigger overrides the ones inside it.
+STAMP = '''
+    INSERT INTO change_seq (user_id, seq) VALUES ({row}.{owner}, 1)
+        ON CONFLICT (user_id) DO UPDATE SET seq = seq + 1;
+    INSERT INTO changes (user_id, entity, entity_id, seq, deleted, archived)
+        SELECT {row}.{owner}, '{entity}', {row}.id, seq, {deleted}, 0
+        FROM change_seq WHERE user_id = {row}.{owner}
+        ON CONFLICT (user_id, entity, entity_id)
+        DO UPDATE SET seq = excluded.seq, deleted = excluded.deleted, archived = 0;
+'''
+
+
+def triggers():
+    # CREATE TRIGGER statements for every synced table. Rebuilding a table
+    # drops its triggers, so init_db() runs these after migrations.
+    statements = []
+    for table, (entity, owner, _) in SYNCED_TABLES.items():
+        for event, row, deleted in (('INSERT', 'NEW', 0), ('UPDATE', 'NEW', 0), ('DELETE', 'OLD', 1)):
+            statements.append(
+                f'''CREATE TRIGGER IF NOT EXISTS sync_{table}_{event.lower()} AFTER {event} ON {table}
+                    BEGIN {STAMP.format(row=row, owner=owner, entity=entity, deleted=deleted)} END'''
+            )
+    return statements
+
+
+def reserve(conn, user_id, count):
+    # Take `count` consecutive sequence numbers; returns the first one
+    conn.execute(
+        '''INSERT INTO change_seq (user_id, seq) VALUES (?, ?)
+           ON CONFLICT (user_id) DO UPDATE SET seq = seq + excluded.seq''',
+        (user_id, count)
+    )
+    return conn.execute('SELECT seq FROM change_seq WHERE user_id = ?', (user_id,)).fetchone()[0] - count + 1
+
+
+def backfill(conn):
+    # Give rows written before the triggers existed an entry, for users who
+    # have no sequence yet. Returns the number of entries written.
+    written = 0
+    user_ids = [row[0] for row in conn.execute(
+        'SELECT id FROM users WHERE id NOT IN (SELECT user_id FROM change_seq)'
+    )]
+    for user_id in user_ids:
+        entries = [('user', user_id, 0)]
+        for table, (entity, owner, _) in SYNCED_TABLES.items():
+            if table != 'users':
+                entries += [(entity, row[0], 0) for row in conn.execute(
+                    f'SELECT id FROM {table} WHERE {owner} = ? ORDER BY id', (user_id,)
+                )]
+        entries += [('expense', row['id'], 1) for row in archived_expenses(conn, user_id)]
+        first = reserve(conn, user_id, len(entries))
+        conn.executemany(
+            '''INSERT OR REPLACE INTO changes (user_id, entity, entity_id, seq, deleted, archived)
+               VALUES (?, ?, ?, ?, 0, ?)''',
+            [(user_id, entity, entity_id, first + i, archived)
+             for i, (entity, entity_id, archived) in enumerate(entries)]
+        )
+        written += len(entries)
+    conn.commit()
+    return written
+
+
+def tombstone_archived(conn, user_id):
+    # The user's archive was deleted: turn its entries into tombstones with
+    # fresh sequence numbers so clients drop those rows too
+    ids = [row[0] for row in conn.execute(
+        "SELECT entity_id FROM changes WHERE user_id = ? AND entity = 'expense' AND archived = 1 ORDER BY seq",
+        (user_id,)
+    )]
+    if not ids:
+        return
+    first = reserve(conn, user_id, len(ids))
+    conn.executemany(
+        '''UPDATE changes SET seq = ?, deleted = 1, archived = 0
+           WHERE user_id = ? AND entity = 'expense' AND entity_id = ?''',
+        [(first + i, user_id, entity_id) for i, entity_id in enumerate(ids)]
+    )
+
+
+def changes_since(conn, user_id, since, limit):
+    # Up to `limit` entries above `since`, oldest first, each with the row's
+    # current fields unless it is a tombstone. Run it inside one read
+    # transaction so entries and rows agree. Returns (records, next_since,
+    # more).
+    entries = conn.execute(
+        '''SELECT entity, entity_id, seq, deleted, archived FROM changes
+           WHERE user_id = ? AND seq > ? ORDER BY seq LIMIT ?''',
+        (user_id, since, limit + 1)
+    ).fetchall()
+    more = len(entries) > limit
+    entries = entries[:limit]
+    next_since = entries[-1][2] if entries else since
+
+    # Current rows, one query per entity type in the page
+    rows = {}
+    for entity, table in ENTITY_TABLES.items():
+        ids = [e[1] for e in entries if e[0] == entity and not e[3] and not e[4]]
+        if ids:
+            for row in conn.execute(f'SELECT * FROM {table} WHERE id IN ({", ".join("?" * len(ids))})', ids):
+                rows[entity, row['id']] = row
+    if any(e[4] for e in entries):
+        rows.update((('expense', row['id']), row) for row in archived_expenses(conn, user_id))
+
+    records = []
+    for entity, entity_id, seq, deleted, archived in entries:
+        record = {'seq': seq, 'type': entity, 'id': entity_id}
+        if deleted:
+            record['deleted'] = 1
+        else:
+            row = rows.get((entity, entity_id))
+            if row is None:
+                continue
+            fields = SYNCED_TABLES[ENTITY_TABLES[entity]][2]
+            record.update((field, row[field]) for field in fields if field in row.keys())
+            if archived:
+                record['archived'] = 1
+        records.append(record)
+    return records, next_since, more
+
+
+def ndjson(records):
+    return ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)